@@ -3,36 +3,71 @@ business_validation_adapter.py - מתאם בין המערכת העסקית למ
 """
 
 from typing import Dict, List, Any, Optional
-from decimal import Decimal
-import json
+from decimal import Decimal, InvalidOperation
+import time
+from functools import lru_cache
+from io import StringIO
 from datetime import datetime
 
 # ייבוא המערכת העסקית
 from validation.schemas import Invoice, LineItem, InvoiceIntro, InvoiceFinal
 from validation.validator import BusinessValidator
 from validation.rules import run_all_rules
+from validation.json_paths import detect_items_path, get_items
+
+# רמות לוג - הודעות מתחת לרמה שנבחרה לא נרשמות כלל
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+_D0 = Decimal("0")
+_INV_100 = Decimal("0.01")
+
+# תווים שמוסרים מערך מספרי לפני המרה ל-Decimal
+_DECIMAL_STRIP = str.maketrans('', '', ',₪$ \t\n\r')
+
+
+@lru_cache(maxsize=4096)
+def _parse_decimal(text: str) -> Decimal:
+    """המרת מחרוזת ל-Decimal אחרי ניקוי תווים (מעבר יחיד על המחרוזת); ערך לא תקין -> 0"""
+    try:
+        return Decimal(text.translate(_DECIMAL_STRIP))
+    except (InvalidOperation, ValueError):
+        return _D0
 
 
 class BusinessValidationAdapter:
     """מתאם המחבר בין מבנה הנתונים הקיים לוולידציה העסקית"""
     
-    def __init__(self):
+    def __init__(self, log_level: str = "INFO"):
         self.validator = BusinessValidator()
         self.conversion_logs = []
+        self.log_level = log_level
+        # נקודת ייחוס להמרת perf_counter לשעון קיר בעת הצגת הלוגים
+        self._wall_origin = time.time()
+        self._perf_origin = time.perf_counter()
     
     def log(self, message: str, level: str = "INFO"):
-        """הוספת לוג למערכת"""
+        """הוספת לוג למערכת (חותמת הזמן מעוצבת רק בעת קריאת הלוגים)"""
+        if LOG_LEVELS.get(level, 20) < LOG_LEVELS.get(self.log_level, 20):
+            return
         self.conversion_logs.append({
-            'timestamp': datetime.now().strftime("%H:%M:%S.%f")[:-3],
+            'ts': time.perf_counter(),
             'level': level,
             'message': message
         })
     
-    def convert_json_to_invoice(self, json_data: Dict[str, Any]) -> Optional[Invoice]:
-        """המרת נתוני JSON לאובייקט Invoice לוולידציה עסקית"""
+    def _format_ts(self, ts: float) -> str:
+        """עיצוב חותמת זמן perf_counter לפורמט HH:MM:SS.mmm"""
+        dt = datetime.fromtimestamp(self._wall_origin + (ts - self._perf_origin))
+        return f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}"
+    
+    def convert_json_to_invoice(self, json_data: Dict[str, Any],
+                                main_items: Optional[List[Dict[str, Any]]] = None) -> Optional[Invoice]:
+        """המרת נתוני JSON לאובייקט Invoice לוולידציה עסקית
+        (main_items שכבר חולצו - למשל ע"י המעבד בזמן הטעינה - חוסכים חילוץ חוזר)"""
         try:
             # חילוץ main_items מהנתונים
-            main_items = self.extract_main_items(json_data)
+            if main_items is None:
+                main_items = self.extract_main_items(json_data)
             if not main_items:
                 self.log("No main_items found in JSON data", "ERROR")
                 return None
@@ -73,38 +108,28 @@ class BusinessValidationAdapter:
             return None
     
     def extract_main_items(self, json_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """חילוץ main_items מהנתונים (נוסח מקורי מהמערכת הקיימת)"""
-        if isinstance(json_data, dict):
-            # נתיב 1: main.main_items
-            if 'main' in json_data and isinstance(json_data['main'], dict):
-                if 'main_items' in json_data['main']:
-                    return json_data['main']['main_items']
-            
-            # נתיב 2: main_items ישיר
-            if 'main_items' in json_data:
-                return json_data['main_items']
-            
-            # נתיב 3: data
-            if 'data' in json_data and isinstance(json_data['data'], list):
-                return json_data['data']
-        
-        return []
+        """חילוץ main_items מהנתונים (main.main_items / main_items / data)"""
+        return get_items(json_data, detect_items_path(json_data))
     
     def convert_item_to_line_item(self, item: Dict[str, Any], line_no: int) -> Optional[LineItem]:
         """המרת item יחיד לאובייקט LineItem"""
         try:
+            # קישור מקומי של המתודות - חוסך חיפוש attribute בכל שדה
+            get = item.get
+            to_decimal = self.safe_decimal
+            
             # שדות חובה
-            description = str(item.get('description', '')).strip()
+            description = str(get('description', '')).strip()
             if not description:
                 raise ValueError("Missing description")
             
-            qty = self.safe_decimal(item.get('quantity', 1))
-            unit_price = self.safe_decimal(item.get('unit_price', 0))
+            qty = to_decimal(get('quantity', 1))
+            unit_price = to_decimal(get('unit_price', 0))
             
             # שדות אופציונליים
-            discount_pct = self.safe_decimal(item.get('discount_percent', 0))
-            vat_pct = self.safe_decimal(item.get('vat_percent', 17))
-            line_total = self.safe_decimal(item.get('total_amount', 0))
+            discount_pct = to_decimal(get('discount_percent', 0))
+            vat_pct = to_decimal(get('vat_percent', 17))
+            line_total = to_decimal(get('total_amount', 0))
             
             # אם line_total לא סופק, נחשב אותו
             if line_total == 0:
@@ -113,13 +138,13 @@ class BusinessValidationAdapter:
             
             line_item = LineItem(
                 line_no=line_no,
-                barcode=item.get('barcode'),
-                item_code=item.get('item_code'),
+                barcode=get('barcode'),
+                item_code=get('item_code'),
                 description=description,
                 qty=qty,
                 unit_price=unit_price,
                 discount_pct=discount_pct,
-                price_after_discount=self.safe_decimal(item.get('price_after_discount', 0)),
+                price_after_discount=to_decimal(get('price_after_discount', 0)),
                 vat_pct=vat_pct,
                 line_total=line_total
             )
@@ -166,30 +191,27 @@ class BusinessValidationAdapter:
     def extract_invoice_final(self, json_data: Dict[str, Any], lines: List[LineItem]) -> Optional[InvoiceFinal]:
         """חילוץ/חישוב סיכום כספי"""
         try:
-            # חישוב סכום השורות
-            subtotal = sum([line.line_total for line in lines], Decimal("0"))
-            
-            # חיפוש VAT amount או חישוב
-            vat_amount = Decimal("0")
-            total = subtotal
-            
             # חיפוש בנתוני הסיכום
+            summary = None
             if 'summary' in json_data:
                 summary = json_data['summary']
-                subtotal = self.safe_decimal(summary.get('subtotal', subtotal))
+            elif 'totals' in json_data:
+                summary = json_data['totals']
+            
+            if summary is not None:
+                # VAT מגיע מהסיכום - מספיק לחשב את סכום השורות כברירת מחדל
+                lines_subtotal = sum((line.line_total for line in lines), _D0)
+                subtotal = self.safe_decimal(summary.get('subtotal', lines_subtotal))
                 vat_amount = self.safe_decimal(summary.get('vat_amount', 0))
                 total = self.safe_decimal(summary.get('total', subtotal + vat_amount))
-            elif 'totals' in json_data:
-                totals = json_data['totals']
-                subtotal = self.safe_decimal(totals.get('subtotal', subtotal))
-                vat_amount = self.safe_decimal(totals.get('vat_amount', 0))
-                total = self.safe_decimal(totals.get('total', subtotal + vat_amount))
             else:
-                # אם אין נתוני סיכום, נחשב VAT בהתבסס על השורות
-                vat_amount = sum([
-                    line.line_total * line.vat_pct / 100 
-                    for line in lines
-                ], Decimal("0"))
+                # אם אין נתוני סיכום, נחשב סכום ו-VAT מהשורות במעבר אחד
+                subtotal = _D0
+                vat_amount = _D0
+                for line in lines:
+                    line_total = line.line_total
+                    subtotal += line_total
+                    vat_amount += line_total * line.vat_pct * _INV_100
                 total = subtotal + vat_amount
             
             return InvoiceFinal(
@@ -205,40 +227,43 @@ class BusinessValidationAdapter:
     def safe_decimal(self, value: Any) -> Decimal:
         """המרה בטוחה לערך Decimal"""
         if value is None or value == "":
-            return Decimal("0")
+            return _D0
         
-        try:
-            # ניקוי הערך מתווים לא רלוונטיים
-            if isinstance(value, str):
-                value = value.strip().replace(",", "").replace("₪", "").replace("$", "")
-            
-            return Decimal(str(value))
-        except:
-            return Decimal("0")
+        # ערכים מספריים - ללא ניקוי מחרוזות
+        if isinstance(value, Decimal):
+            return value
+        if isinstance(value, int):
+            return Decimal(value)
+        if isinstance(value, float):
+            return _parse_decimal(repr(value))
+        
+        # מחרוזות (וערכים אחרים) - דרך מטמון, ערכים כמו "17" או "0" חוזרים בהרבה שורות
+        return _parse_decimal(value if isinstance(value, str) else str(value))
     
     def validate_business_logic(self, json_files_data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """הרצת וולידציה עסקית על כל הקבצים"""
         results = {}
         
         for file_key, items_list in json_files_data.items():
+            # רשימת לוגים חדשה לכל קובץ (במקום העתקה וניקוי)
+            self.conversion_logs = []
             self.log(f"Starting business validation for file: {file_key}", "INFO")
             
             # המרה לפורמט חשבונית
             file_json = {'main_items': items_list}
-            invoice = self.convert_json_to_invoice(file_json)
+            invoice = self.convert_json_to_invoice(file_json, items_list)
             
             if invoice:
                 try:
                     # הרצת וולידציה עסקית
-                    validation_result = self.validator.validate(invoice.model_dump())
+                    validation_result = self.validator.validate_model(invoice)
                     
                     results[file_key] = {
                         'success': True,
                         'score': validation_result['score'],
                         'status': validation_result['status'],
                         'issues': validation_result['issues'],
-                        'lines_validated': len(invoice.lines),
-                        'conversion_logs': self.conversion_logs.copy()
+                        'lines_validated': len(invoice.lines)
                     }
                     
                     self.log(f"Business validation completed for {file_key}: Score {validation_result['score']}, Status {validation_result['status']}", "INFO")
@@ -246,69 +271,77 @@ class BusinessValidationAdapter:
                 except Exception as e:
                     results[file_key] = {
                         'success': False,
-                        'error': str(e),
-                        'conversion_logs': self.conversion_logs.copy()
+                        'error': str(e)
                     }
                     self.log(f"Business validation failed for {file_key}: {str(e)}", "ERROR")
             else:
                 results[file_key] = {
                     'success': False,
-                    'error': 'Failed to convert to invoice format',
-                    'conversion_logs': self.conversion_logs.copy()
+                    'error': 'Failed to convert to invoice format'
                 }
                 self.log(f"Failed to convert {file_key} to invoice format", "ERROR")
             
-            # ניקוי לוגים לקובץ הבא
-            self.conversion_logs.clear()
+            # הלוגים של הקובץ עוברים לתוצאה - כולל הודעת הסיום
+            results[file_key]['conversion_logs'] = self._render_logs(self.conversion_logs)
         
+        self.conversion_logs = []
         return results
     
     def generate_business_validation_report(self, results: Dict[str, Any]) -> str:
         """יצירת דוח וולידציה עסקית"""
-        report_lines = []
-        report_lines.append("=== BUSINESS VALIDATION REPORT ===\n")
+        buf = StringIO()
+        write = buf.write
+        write("=== BUSINESS VALIDATION REPORT ===\n\n")
         
         # סיכום כללי
         total_files = len(results)
         successful_files = sum(1 for r in results.values() if r.get('success', False))
         
-        report_lines.append(f"FILES PROCESSED: {total_files}")
-        report_lines.append(f"SUCCESSFUL VALIDATIONS: {successful_files}")
-        report_lines.append(f"FAILED VALIDATIONS: {total_files - successful_files}\n")
+        write(f"FILES PROCESSED: {total_files}\n")
+        write(f"SUCCESSFUL VALIDATIONS: {successful_files}\n")
+        write(f"FAILED VALIDATIONS: {total_files - successful_files}\n\n")
         
         # פירוט לכל קובץ
         for file_key, result in results.items():
-            report_lines.append(f"--- {file_key} ---")
+            write(f"--- {file_key} ---\n")
             
             if result.get('success', False):
                 score = result.get('score', 0)
                 status = result.get('status', 'UNKNOWN')
                 issues = result.get('issues', [])
                 
-                report_lines.append(f"Score: {score}/100")
-                report_lines.append(f"Status: {status}")
-                report_lines.append(f"Lines Validated: {result.get('lines_validated', 0)}")
+                write(f"Score: {score}/100\n")
+                write(f"Status: {status}\n")
+                write(f"Lines Validated: {result.get('lines_validated', 0)}\n")
                 
                 if issues:
-                    report_lines.append(f"Issues Found: {len(issues)}")
+                    write(f"Issues Found: {len(issues)}\n")
                     for issue in issues:
                         severity = issue.get('severity', 'UNKNOWN')
                         code = issue.get('code', 'UNKNOWN')
                         message = issue.get('message', 'No message')
-                        report_lines.append(f"  [{severity}] {code}: {message}")
+                        write(f"  [{severity}] {code}: {message}\n")
                 else:
-                    report_lines.append("No issues found")
+                    write("No issues found\n")
             else:
                 error = result.get('error', 'Unknown error')
-                report_lines.append(f"FAILED: {error}")
+                write(f"FAILED: {error}\n")
             
-            report_lines.append("")
+            write("\n")
         
-        return "\n".join(report_lines)
+        # כל שורה נכתבת עם \n - השמטת האחרון שומרת על הפורמט של "\n".join
+        return buf.getvalue()[:-1]
     
     def get_logs(self) -> List[Dict[str, str]]:
         """קבלת כל הלוגים"""
-        return self.conversion_logs.copy()
+        return self._render_logs(self.conversion_logs)
+    
+    def _render_logs(self, entries: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """עיצוב רשומות לוג לתצוגה/ייצוא"""
+        return [
+            {'timestamp': self._format_ts(entry['ts']), 'level': entry['level'], 'message': entry['message']}
+            for entry in entries
+        ]
     
     def clear_logs(self):
         """ניקוי לוגים"""
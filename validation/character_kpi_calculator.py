@@ -1,17 +1,52 @@
 """
 character_kpi_calculator.py - מחשבון KPI מתקדם ברמת תווים
+
+חוזה קלט: calculate_global_kpis / calculate_line_kpis מקבלים את ה-dicts הגולמיים
+כפי שחולצו מה-JSON (extract_main_items), ולא מודלי Pydantic (Invoice/LineItem)
+או model_dump שלהם - ההשוואה נעשית על ערכי ה-OCR המקוריים, ללא נרמול Decimal.
 """
 
-import json
+import time
+from io import StringIO
+from itertools import zip_longest
+from operator import eq
 from typing import Dict, List, Any, Tuple
 from datetime import datetime
 
+from validation.json_io import dumps
+from validation.json_paths import ITEMS_NONE, detect_items_path, get_items
+
+# רמות לוג - הודעות מתחת לרמה שנבחרה לא נרשמות כלל
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+
+def compare_batch(gt_values: List[str], pred_values: List[str]) -> Tuple[List[int], List[int]]:
+    """השוואת תווים לרשימת זוגות מחרוזות מנוקות (GT לא ריק) במעבר אחד.
+    מחזיר (total_chars, correct_chars) לכל זוג - זהה לתוצאת compare_characters"""
+    totals = []
+    corrects = []
+    for gt_str, pred_str in zip(gt_values, pred_values):
+        if gt_str == pred_str:
+            n = len(gt_str)
+            totals.append(n)
+            corrects.append(n)
+        else:
+            totals.append(max(len(gt_str), len(pred_str)))
+            # map(eq) רץ ב-C ועוצר באורך הקצר - שאר התווים נספרים כשגויים
+            corrects.append(sum(map(eq, gt_str, pred_str)))
+    return totals, corrects
+
 
 class CharacterKPICalculator:
     """מחשבון KPI מתקדם עם השוואה ברמת תווים"""
     
-    def __init__(self):
-        self.calculation_logs = []
+    def __init__(self, log_level: str = "INFO"):
+        self.calculation_logs = []  # (perf_counter, level, message)
+        self._rendered_logs = []    # רשומות מעוצבות, מתארכות רק ברשומות החדשות
+        self.log_level = log_level
+        # נקודת ייחוס להמרת perf_counter לשעון קיר בעת הצגת הלוגים
+        self._wall_origin = time.time()
+        self._perf_origin = time.perf_counter()
         # שדות למדידה - סטנדרטיים
         self.measured_fields = [
             'barcode', 'item_code', 'description', 'quantity', 'unit_price', 
@@ -19,78 +54,49 @@ class CharacterKPICalculator:
         ]
     
     def log(self, message: str, level: str = "INFO"):
-        """הוספת לוג למערכת"""
-        self.calculation_logs.append({
-            'timestamp': datetime.now().strftime("%H:%M:%S.%f")[:-3],
-            'level': level,
-            'message': message
-        })
+        """הוספת לוג למערכת (חותמת הזמן מעוצבת רק בעת קריאת הלוגים)"""
+        if LOG_LEVELS.get(level, 20) < LOG_LEVELS.get(self.log_level, 20):
+            return
+        self.calculation_logs.append((time.perf_counter(), level, message))
+    
+    def _format_ts(self, ts: float) -> str:
+        """עיצוב חותמת זמן perf_counter לפורמט HH:MM:SS.mmm"""
+        dt = datetime.fromtimestamp(self._wall_origin + (ts - self._perf_origin))
+        return f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}"
     
     def extract_main_items(self, json_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """חילוץ main_items מ-JSON"""
-        if isinstance(json_data, dict):
-            # נתיב 1: main.main_items
-            if 'main' in json_data and isinstance(json_data['main'], dict):
-                if 'main_items' in json_data['main']:
-                    return json_data['main']['main_items']
-            
-            # נתיב 2: main_items ישיר
-            if 'main_items' in json_data:
-                return json_data['main_items']
-            
-            # נתיב 3: data
-            if 'data' in json_data and isinstance(json_data['data'], list):
-                return json_data['data']
-        
-        self.log(f"Could not find main_items in JSON structure", "WARNING")
-        return []
+        """חילוץ main_items מ-JSON (main.main_items / main_items / data)"""
+        items_path = detect_items_path(json_data)
+        if items_path == ITEMS_NONE:
+            self.log(f"Could not find main_items in JSON structure", "WARNING")
+        return get_items(json_data, items_path)
     
-    def compare_characters(self, ground_truth: str, predicted: str) -> Dict[str, Any]:
-        """השוואת תווים ברמה גרנולרית"""
+    def compare_characters(self, ground_truth: str, predicted: str,
+                           include_scores: bool = False) -> Dict[str, Any]:
+        """השוואת תווים ברמה גרנולרית (char_scores מוחזר רק עם include_scores=True)"""
         gt_str = str(ground_truth).strip()
         pred_str = str(predicted).strip()
         
-        # אם שניהם ריקים
-        if not gt_str and not pred_str:
+        # מחרוזות זהות (כולל שתיהן ריקות) - המקרה הנפוץ, ללא לולאה
+        if gt_str == pred_str:
+            n = len(gt_str)
             return {
-                'total_chars': 0,
-                'correct_chars': 0,
+                'total_chars': n,
+                'correct_chars': n,
                 'accuracy': 1.0,
-                'char_scores': []
+                'char_scores': [1] * n if include_scores else None
             }
         
-        # אם אחד מהם ריק
-        if not gt_str or not pred_str:
-            longer_str = gt_str or pred_str
-            return {
-                'total_chars': len(longer_str),
-                'correct_chars': 0,
-                'accuracy': 0.0,
-                'char_scores': [0] * len(longer_str)
-            }
-        
-        # השוואה תו-תו
+        # השוואה תו-תו: map(eq) עוצר באורך הקצר, שאר התווים נספרים כשגויים
+        # (כולל המקרה שאחת המחרוזות ריקה)
         max_len = max(len(gt_str), len(pred_str))
-        char_scores = []
-        correct_chars = 0
-        
-        for i in range(max_len):
-            gt_char = gt_str[i] if i < len(gt_str) else ''
-            pred_char = pred_str[i] if i < len(pred_str) else ''
-            
-            if gt_char == pred_char:
-                char_scores.append(1)
-                correct_chars += 1
-            else:
-                char_scores.append(0)
-        
-        accuracy = correct_chars / max_len if max_len > 0 else 1.0
+        correct_chars = sum(map(eq, gt_str, pred_str))
         
         return {
             'total_chars': max_len,
             'correct_chars': correct_chars,
-            'accuracy': accuracy,
-            'char_scores': char_scores
+            'accuracy': correct_chars / max_len,
+            'char_scores': [int(a == b) for a, b in zip_longest(gt_str, pred_str)] if include_scores else None
         }
     
     def calculate_line_kpis(self, ground_truth_line: Dict[str, Any], 
@@ -135,6 +141,15 @@ class CharacterKPICalculator:
         
         return line_results
     
+    def _to_soa(self, line_map: Dict[Any, Dict[str, Any]], line_numbers: List[Any]) -> Dict[str, List[str]]:
+        """המרת שורות (dict לכל שורה) לעמודה לכל שדה נמדד, מיושרת לפי line_numbers.
+        הערכים מנוקים (str + strip); שורה חסרה מיוצגת כמחרוזת ריקה"""
+        rows = [line_map.get(line_num) for line_num in line_numbers]
+        return {
+            field: [str(row.get(field, '')).strip() if row is not None else '' for row in rows]
+            for field in self.measured_fields
+        }
+    
     def calculate_global_kpis(self, ground_truth_data: List[Dict[str, Any]], 
                              predicted_files: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """חישוב KPIs גלובליים"""
@@ -164,59 +179,91 @@ class CharacterKPICalculator:
         # חישוב KPIs לכל שורה
         global_results = {}
         
+        sorted_line_numbers = sorted(all_line_numbers)
+        
+        # פריסה עמודתית (SoA) של ה-Ground Truth - פעם אחת לכל הקבצים
+        gt_columns = self._to_soa(gt_map, sorted_line_numbers)
+        gt_measured_per_line = [sum(1 for column in gt_columns.values() if column[idx])
+                                for idx in range(len(sorted_line_numbers))]
+        
+        # שלב 1: פריסת כל זוגות ההשוואה של כל הקבצים (קובץ × שדה × שורה) לרשימה שטוחה אחת,
+        # עם מקטע [start, end) לכל (קובץ, שדה)
+        flat_gt = []
+        flat_pred = []
+        segments = {}  # {file_key: [(field, start, end), ...]}
+        processed_lines_by_file = {}
+        
         for file_key in predicted_files.keys():
-            total_chars = 0
-            correct_chars = 0
-            field_stats = {field: {'total_chars': 0, 'correct_chars': 0, 'measured_count': 0} for field in self.measured_fields}
-            processed_lines = 0
-            total_measured_fields = 0
+            file_map = files_map[file_key]
+            pred_columns = self._to_soa(file_map, sorted_line_numbers)
             
-            for line_num in sorted(all_line_numbers):
+            # אינדקסים של שורות שקיימות גם ב-Ground Truth וגם בקובץ
+            line_indexes = []
+            for idx, line_num in enumerate(sorted_line_numbers):
                 if line_num not in gt_map:
                     self.log(f"Line {line_num} missing from ground truth", "WARNING")
                     continue
                 
-                if line_num not in files_map[file_key]:
+                if line_num not in file_map:
                     self.log(f"Line {line_num} missing from file {file_key}", "WARNING")
                     continue
                 
-                gt_line = gt_map[line_num]
-                pred_line = files_map[file_key][line_num]
+                if gt_measured_per_line[idx] == 0:
+                    self.log(f"No fields to measure in line for file {file_key}", "WARNING")
+                line_indexes.append(idx)
+            
+            processed_lines_by_file[file_key] = len(line_indexes)
+            file_segments = segments[file_key] = []
+            
+            # רק שדות שנמדדו (ערך GT לא ריק)
+            for field, gt_column in gt_columns.items():
+                pred_column = pred_columns[field]
+                measured_indexes = [idx for idx in line_indexes if gt_column[idx]]
                 
-                line_kpis = self.calculate_line_kpis(gt_line, {file_key: pred_line})
-                file_line_result = line_kpis[file_key]
+                skipped = len(line_indexes) - len(measured_indexes)
+                if skipped:
+                    self.log(f"Skipping {skipped} empty '{field}' values in Ground Truth", "DEBUG")
+                if not measured_indexes:
+                    continue
                 
-                total_chars += file_line_result['total_chars']
-                correct_chars += file_line_result['correct_chars']
-                processed_lines += 1
-                total_measured_fields += file_line_result['measured_fields']
+                start = len(flat_gt)
+                flat_gt.extend(gt_column[idx] for idx in measured_indexes)
+                flat_pred.extend(pred_column[idx] for idx in measured_indexes)
+                file_segments.append((field, start, len(flat_gt)))
+        
+        # שלב 2: השוואה אחת על כל הזוגות
+        totals, corrects = compare_batch(flat_gt, flat_pred)
+        
+        # שלב 3: צבירה לפי מקטעים
+        for file_key, file_segments in segments.items():
+            total_chars = 0
+            correct_chars = 0
+            total_measured_fields = 0
+            field_accuracies = {}
+            
+            for field, start, end in file_segments:
+                field_total = sum(totals[start:end])
+                field_correct = sum(corrects[start:end])
+                
+                field_accuracies[field] = {
+                    'accuracy': field_correct / field_total if field_total > 0 else 0.0,
+                    'total_chars': field_total,
+                    'correct_chars': field_correct,
+                    'measured_in_lines': end - start
+                }
                 
-                # צבירת נתוני שדות - רק שדות שנמדדו בפועל
-                for field, field_result in file_line_result['field_results'].items():
-                    field_stats[field]['total_chars'] += field_result['total_chars']
-                    field_stats[field]['correct_chars'] += field_result['correct_chars']
-                    field_stats[field]['measured_count'] += 1
+                total_chars += field_total
+                correct_chars += field_correct
+                total_measured_fields += end - start
             
             # חישוב דיוק כולל
             overall_accuracy = correct_chars / total_chars if total_chars > 0 else 0.0
             
-            # חישוב דיוק לכל שדה - רק שדות שנמדדו
-            field_accuracies = {}
-            for field, stats in field_stats.items():
-                if stats['measured_count'] > 0:  # רק שדות שאכן נמדדו
-                    field_accuracy = stats['correct_chars'] / stats['total_chars'] if stats['total_chars'] > 0 else 0.0
-                    field_accuracies[field] = {
-                        'accuracy': field_accuracy,
-                        'total_chars': stats['total_chars'],
-                        'correct_chars': stats['correct_chars'],
-                        'measured_in_lines': stats['measured_count']
-                    }
-            
             global_results[file_key] = {
                 'overall_accuracy': overall_accuracy,
                 'total_characters': total_chars,
                 'correct_characters': correct_chars,
-                'processed_lines': processed_lines,
+                'processed_lines': processed_lines_by_file[file_key],
                 'total_measured_fields': total_measured_fields,
                 'field_accuracies': field_accuracies
             }
@@ -227,32 +274,33 @@ class CharacterKPICalculator:
     
     def generate_detailed_report(self, kpi_results: Dict[str, Any]) -> str:
         """יצירת דוח מפורט"""
-        report_lines = []
-        report_lines.append("=== DETAILED CHARACTER-LEVEL KPI REPORT ===\n")
+        buf = StringIO()
+        write = buf.write
+        write("=== DETAILED CHARACTER-LEVEL KPI REPORT ===\n\n")
         
         # סיכום כללי
-        report_lines.append("SUMMARY:")
+        write("SUMMARY:\n")
         for file_key, results in kpi_results.items():
             accuracy = results['overall_accuracy']
             total_chars = results['total_characters']
             correct_chars = results['correct_characters']
             measured_fields = results.get('total_measured_fields', 0)
             
-            report_lines.append(f"  {file_key}: {accuracy:.1%} ({correct_chars:,}/{total_chars:,} chars, {measured_fields} fields)")
+            write(f"  {file_key}: {accuracy:.1%} ({correct_chars:,}/{total_chars:,} chars, {measured_fields} fields)\n")
         
-        report_lines.append("")
+        write("\n")
         
         # פירוט לכל קובץ
         for file_key, results in kpi_results.items():
-            report_lines.append(f"--- {file_key} DETAILED ANALYSIS ---")
-            report_lines.append(f"Overall Accuracy: {results['overall_accuracy']:.3f}")
-            report_lines.append(f"Total Characters: {results['total_characters']:,}")
-            report_lines.append(f"Correct Characters: {results['correct_characters']:,}")
-            report_lines.append(f"Processed Lines: {results['processed_lines']}")
-            report_lines.append(f"Total Measured Fields: {results.get('total_measured_fields', 0)}")
-            report_lines.append("")
+            write(f"--- {file_key} DETAILED ANALYSIS ---\n")
+            write(f"Overall Accuracy: {results['overall_accuracy']:.3f}\n")
+            write(f"Total Characters: {results['total_characters']:,}\n")
+            write(f"Correct Characters: {results['correct_characters']:,}\n")
+            write(f"Processed Lines: {results['processed_lines']}\n")
+            write(f"Total Measured Fields: {results.get('total_measured_fields', 0)}\n")
+            write("\n")
             
-            report_lines.append("Field-by-Field Breakdown (only measured fields):")
+            write("Field-by-Field Breakdown (only measured fields):\n")
             field_accuracies = results.get('field_accuracies', {})
             if field_accuracies:
                 for field, field_data in field_accuracies.items():
@@ -260,21 +308,31 @@ class CharacterKPICalculator:
                     total = field_data['total_chars']
                     correct = field_data['correct_chars']
                     lines_measured = field_data.get('measured_in_lines', 0)
-                    report_lines.append(f"  {field}: {acc:.3f} ({correct}/{total} chars in {lines_measured} lines)")
+                    write(f"  {field}: {acc:.3f} ({correct}/{total} chars in {lines_measured} lines)\n")
             else:
-                report_lines.append("  No fields were measured (all Ground Truth fields were empty)")
+                write("  No fields were measured (all Ground Truth fields were empty)\n")
             
-            report_lines.append("")
+            write("\n")
         
-        return "\n".join(report_lines)
+        # כל שורה נכתבת עם \n - השמטת האחרון שומרת על הפורמט של "\n".join
+        return buf.getvalue()[:-1]
     
     def get_logs(self) -> List[Dict[str, str]]:
-        """קבלת כל הלוגים"""
-        return self.calculation_logs.copy()
+        """קבלת כל הלוגים (רק רשומות שנוספו מאז הקריאה הקודמת מעוצבות מחדש)"""
+        rendered = self._rendered_logs
+        done = len(rendered)
+        if done < len(self.calculation_logs):
+            format_ts = self._format_ts
+            rendered.extend(
+                {'timestamp': format_ts(ts), 'level': level, 'message': message}
+                for ts, level, message in self.calculation_logs[done:]
+            )
+        return rendered.copy()
     
     def clear_logs(self):
         """ניקוי לוגים"""
         self.calculation_logs.clear()
+        self._rendered_logs.clear()
 
 
 def main():
@@ -289,7 +347,7 @@ def main():
     }
     
     result = calculator.calculate_line_kpis(gt_line, pred_files)
-    print(json.dumps(result, indent=2))
+    print(dumps(result).decode('utf-8'))
 
 
 if __name__ == "__main__":
@@ -5,13 +5,31 @@ enhanced_validation_gui.py - GUI בסיסי לוולידציה עם פיצ'ר י
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
 from pathlib import Path
-import json
+import os
+import queue
+import re
 import threading
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
 
 from character_kpi_calculator import CharacterKPICalculator
 from enhanced_validation_processor import EnhancedValidationProcessor, ValidationMethod
+from validation.json_io import dumps, loads, load_path, dump_path
+
+# תבניות מהודרות להמרת ערכי תאים בלי לעבור דרך חריגות
+_QUOTE_CHARS = frozenset('"\'')
+_INT_MATCH = re.compile(r'[+-]?\d+').fullmatch
+_FLOAT_MATCH = re.compile(r'[+-]?(?:\d+[.,]\d*|[.,]\d+)').fullmatch
+
+# תגית bind משותפת לתאי עורך ה-Ground Truth
+_CELL_TAG = 'GTCellEntry'
+
+# מספר קבצי Ground Truth מפוענחים שנשמרים בזיכרון
+GT_CACHE_SIZE = 5
+
+# גודל מקטע בהזרמת הדוח לתיבת הטקסט
+REPORT_CHUNK_SIZE = 65536
 
 
 class SourceDataManager:
@@ -27,19 +45,31 @@ class SourceDataManager:
         """טעינת נתוני מקור שמורים"""
         try:
             if self.sources_file.exists():
-                with open(self.sources_file, 'r', encoding='utf-8') as f:
-                    self.saved_sources = json.load(f)
+                self.saved_sources = load_path(self.sources_file)
             else:
                 self.saved_sources = {}
         except Exception:
             self.saved_sources = {}
+        self._names = tuple(sorted(self.saved_sources))
+        self._hashes = {name: hash(dumps(value, indent=False))
+                        for name, value in self.saved_sources.items()}
     
     def save_source_template(self, name: str, template_data: Dict[str, Any]) -> bool:
         """שמירת תבנית נתוני מקור"""
         try:
+            # תבנית זהה לשמורה - אין צורך לכתוב שוב את כל הקובץ
+            h = hash(dumps(template_data, indent=False))
+            if self._hashes.get(name) == h:
+                return True
+            
             self.saved_sources[name] = template_data
-            with open(self.sources_file, 'w', encoding='utf-8') as f:
-                json.dump(self.saved_sources, f, ensure_ascii=False, indent=2)
+            self._names = tuple(sorted(self.saved_sources))
+            
+            # כתיבה אטומית: קובץ זמני ואז החלפה, כדי לא להשחית את המאגר באמצע כתיבה
+            tmp = self.sources_file.with_suffix('.json.tmp')
+            tmp.write_bytes(dumps(self.saved_sources))
+            os.replace(tmp, self.sources_file)
+            self._hashes[name] = h
             return True
         except Exception:
             return False
@@ -47,11 +77,41 @@ class SourceDataManager:
     def get_saved_sources(self) -> Dict[str, Any]:
         """קבלת כל נתוני המקור השמורים"""
         return self.saved_sources.copy()
+    
+    def get_saved_source_names(self) -> Tuple[str, ...]:
+        """שמות התבניות השמורות (ממוין, מחושב מחדש רק בשמירה)"""
+        return self._names
+    
+    def get_template(self, name: str) -> Optional[Any]:
+        """קבלת תבנית לפי שם, ללא העתקת כל המאגר"""
+        return self.saved_sources.get(name)
+
+
+def _parse_line_number(text: str) -> Union[int, float, str]:
+    """מספר השורה מתוך מפתח template (line_<n>) כערך המספרי שממנו נבנה:
+    int ("3", וגם "1.0" שמגיע מ-line מסוג float), float לערך לא שלם,
+    והמחרוזת עצמה רק אם אינה מספר (אז גם ה-line המקורי היה מחרוזת)"""
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return int(number) if number.is_integer() else number
 
 
 class GroundTruthEditor:
     """עורך נתוני Ground Truth מתקדם עם ייצוא וייבוא"""
     
+    # דיאלוגים קשורים פעם אחת ברמת המחלקה
+    _showinfo = staticmethod(messagebox.showinfo)
+    _showerror = staticmethod(messagebox.showerror)
+    _showwarning = staticmethod(messagebox.showwarning)
+    _askyesno = staticmethod(messagebox.askyesno)
+    _askopenfilename = staticmethod(filedialog.askopenfilename)
+    
     def __init__(self, parent, template_data: Dict[str, Any], callback, source_manager: SourceDataManager, file_prefix: str = "template"):
         self.parent = parent
         self.template_data = template_data
@@ -68,6 +128,11 @@ class GroundTruthEditor:
         self.window.geometry("1200x750")
         self.window.transient(self.parent)
         self.window.grab_set()
+        self.window.protocol("WM_DELETE_WINDOW", self._on_close)
+        
+        # קיצורי העתק-הדבק נרשמים פעם אחת לכל תאי העריכה
+        self.window.bind_class(_CELL_TAG, '<Control-c>', self._on_copy_cell)
+        self.window.bind_class(_CELL_TAG, '<Control-v>', self._on_paste_cell)
         
         # כותרת
         title_frame = ttk.Frame(self.window)
@@ -91,9 +156,8 @@ class GroundTruthEditor:
         ttk.Label(templates_frame, text="תבניות שמורות:").pack(side=tk.LEFT, padx=(0, 5))
         
         self.template_var = tk.StringVar()
-        saved_sources = list(self.source_manager.get_saved_sources().keys())
         self.template_combo = ttk.Combobox(templates_frame, textvariable=self.template_var, 
-                                          values=saved_sources, state="readonly", width=20)
+                                          values=self.source_manager.get_saved_source_names(), state="readonly", width=20)
         self.template_combo.pack(side=tk.LEFT, padx=(0, 10))
         self.template_combo.bind('<<ComboboxSelected>>', self.load_template)
         
@@ -131,9 +195,10 @@ class GroundTruthEditor:
         scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=canvas.yview)
         scrollable_frame = ttk.Frame(canvas)
         
+        # אזור הגלילה נגזר ישירות מגודל ה-Frame, בלי לחשב bbox על כל הרשת
         scrollable_frame.bind(
             "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+            lambda e: canvas.configure(scrollregion=(0, 0, e.width, e.height))
         )
         
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
@@ -171,15 +236,15 @@ class GroundTruthEditor:
         ttk.Button(action_frame, text="שמור נתוני מקור", 
                   command=self.save_ground_truth).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="ביטול", 
-                  command=self.window.destroy).pack(side=tk.LEFT, padx=5)
+                  command=self._on_close).pack(side=tk.LEFT, padx=5)
     
     def export_template_to_file(self):
         """ייצוא התבנית הנוכחית לקובץ JSON - שמירה אוטומטית לתיקייה"""
         try:
             ground_truth_data = self.collect_current_data()
             
-            if not ground_truth_data or all(len(item) <= 1 for item in ground_truth_data):
-                messagebox.showwarning("אזהרה", "אין נתונים לייצוא")
+            if not ground_truth_data:
+                self._showwarning("אזהרה", "אין נתונים לייצוא")
                 return
             
             # יצירת תיקיית היעד
@@ -206,22 +271,27 @@ class GroundTruthEditor:
                 },
                 "ground_truth_data": ground_truth_data,
                 "fields_structure": {
-                    "available_fields": [f for f in self.template_data['fields'] if f != 'line'],
+                    "available_fields": list(self._data_fields),
                     "line_numbers": [item.get('line', i+1) for i, item in enumerate(ground_truth_data)]
                 }
             }
             
-            # שמירה לקובץ
-            with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
+            # שמירה לקובץ ברקע - הקידוד והכתיבה לא חוסמים את הממשק
+            def write_in_background():
+                try:
+                    dump_path(export_data, full_path)
+                    self.window.after(0, lambda: self._showinfo("הצלחה", 
+                                       f"התבנית נשמרה בהצלחה:\n"
+                                       f"שם קובץ: {filename}\n"
+                                       f"נתיב: {full_path}"))
+                except Exception as e:
+                    error_msg = str(e)
+                    self.window.after(0, lambda: self._showerror("שגיאה", f"שגיאה בייצוא התבנית: {error_msg}"))
             
-            messagebox.showinfo("הצלחה", 
-                               f"התבנית נשמרה בהצלחה:\n"
-                               f"שם קובץ: {filename}\n"
-                               f"נתיב: {full_path}")
+            threading.Thread(target=write_in_background, daemon=True).start()
             
         except Exception as e:
-            messagebox.showerror("שגיאה", f"שגיאה בייצוא התבנית: {str(e)}")
+            self._showerror("שגיאה", f"שגיאה בייצוא התבנית: {str(e)}")
     
     def get_file_prefix(self):
         """מחזיר את הקידומת שנשלחה מהממשק הראשי"""
@@ -231,7 +301,7 @@ class GroundTruthEditor:
         """ייבוא תבנית מקובץ JSON"""
         try:
             # בחירת קובץ לייבוא
-            filename = filedialog.askopenfilename(
+            filename = self._askopenfilename(
                 title="טען תבנית מקובץ JSON",
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
             )
@@ -239,10 +309,31 @@ class GroundTruthEditor:
             if not filename:
                 return
             
-            # טעינת הקובץ
-            with open(filename, 'r', encoding='utf-8') as f:
-                imported_data = json.load(f)
-            
+            # טעינת הקובץ ופענוחו ברקע
+            self._parse_async(filename,
+                              lambda data: self._apply_imported_data(filename, data),
+                              self._on_import_error)
+                
+        except Exception as e:
+            self._on_import_error(str(e))
+    
+    def _parse_async(self, filename, ok_cb, err_cb):
+        """קריאה ופענוח JSON בחוט רקע; התוצאה מוחזרת ל-Tk דרך after"""
+        def worker():
+            try:
+                data = load_path(filename)
+                self.window.after(0, ok_cb, data)
+            except Exception as e:
+                self.window.after(0, err_cb, str(e))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def _on_import_error(self, error_msg: str):
+        self._showerror("שגיאה", f"שגיאה בייבוא התבנית: {error_msg}")
+    
+    def _apply_imported_data(self, filename, imported_data):
+        """זיהוי פורמט הקובץ שיובא וטעינתו לשדות העריכה"""
+        try:
             # בדיקת פורמט הקובץ
             if isinstance(imported_data, dict) and 'ground_truth_data' in imported_data:
                 # פורמט מלא (עם metadata)
@@ -256,41 +347,50 @@ class GroundTruthEditor:
                 
                 message = f"מידע על התבנית:\nנוצרה: {created_at}\nשדות: {fields_count}\nשורות: {lines_count}\n\nהאם לטעון תבנית זו?"
                 
-                if not messagebox.askyesno("אשר ייבוא", message):
+                if not self._askyesno("אשר ייבוא", message):
                     return
                     
             elif isinstance(imported_data, list):
                 # פורמט פשוט (רשימת נתונים בלבד)
                 template_data = imported_data
                 
-            elif isinstance(imported_data, dict) and any(key in imported_data for key in ['main_items', 'ground_truth', 'data']):
-                # פורמט Ground Truth רגיל
-                if 'ground_truth' in imported_data:
-                    template_data = imported_data['ground_truth']
-                elif 'main_items' in imported_data:
-                    template_data = imported_data['main_items']
-                elif 'data' in imported_data:
-                    template_data = imported_data['data']
+            elif isinstance(imported_data, dict):
+                # פורמט Ground Truth רגיל - המפתח הראשון שקיים לפי סדר עדיפות
+                for key in ('ground_truth', 'main_items', 'data'):
+                    if (value := imported_data.get(key)) is not None:
+                        template_data = value
+                        break
                 else:
-                    raise ValueError("פורמט קובץ לא מזוהה")
+                    raise ValueError("פורמט קובץ לא תקין")
             else:
                 raise ValueError("פורמט קובץ לא תקין")
             
             # טעינת הנתונים לממשק
             if isinstance(template_data, list) and template_data:
                 self.load_data_to_entries(template_data)
-                messagebox.showinfo("הצלחה", f"התבנית נטענה בהצלחה מהקובץ:\n{Path(filename).name}")
+                self._showinfo("הצלחה", f"התבנית נטענה בהצלחה מהקובץ:\n{Path(filename).name}")
             else:
-                messagebox.showwarning("אזהרה", "הקובץ לא כולל נתונים תקינים")
+                self._showwarning("אזהרה", "הקובץ לא כולל נתונים תקינים")
                 
         except Exception as e:
-            messagebox.showerror("שגיאה", f"שגיאה בייבוא התבנית: {str(e)}")
+            self._on_import_error(str(e))
     
     def create_field_entries(self, parent):
         """יצירת שדות עריכה"""
         template = self.template_data['template']
         fields = self.template_data['fields']
         
+        # רשימת שדות ומפתחות Entry מחושבים פעם אחת לכל העורך
+        self._data_fields = tuple(f for f in fields if f != 'line')
+        self._entry_keys = {line_key: {f: f"{line_key}_{f}" for f in self._data_fields}
+                            for line_key in template}
+        self._line_index = {k: _parse_line_number(k.split('_', 1)[1]) for k in template}
+        if all(type(n) is not str for n in self._line_index.values()):
+            self._sorted_line_keys = sorted(template, key=self._line_index.get)
+        else:
+            # מספר שורה שאינו מספרי כלל - נשמר כמו שהוא, והשורות בסדר ה-template
+            self._sorted_line_keys = list(template)
+        
         # כותרות עמודות
         headers_frame = ttk.Frame(parent)
         headers_frame.pack(fill=tk.X, pady=(0, 10))
@@ -298,10 +398,9 @@ class GroundTruthEditor:
         ttk.Label(headers_frame, text="שורה", font=('Arial', 10, 'bold')).grid(
             row=0, column=0, padx=5, pady=5, sticky='w')
         
-        for i, field in enumerate(fields):
-            if field != 'line':
-                ttk.Label(headers_frame, text=field, font=('Arial', 10, 'bold')).grid(
-                    row=0, column=i+1, padx=5, pady=5, sticky='w')
+        for i, field in enumerate(self._data_fields):
+            ttk.Label(headers_frame, text=field, font=('Arial', 10, 'bold')).grid(
+                row=0, column=i+1, padx=5, pady=5, sticky='w')
         
         # יצירת שורות נתונים
         data_frame = ttk.Frame(parent)
@@ -309,7 +408,7 @@ class GroundTruthEditor:
         
         row = 0
         for line_key, line_data in template.items():
-            line_num = line_key.split('_')[1]
+            line_num = self._line_index[line_key]
             
             # תווית שורה
             ttk.Label(data_frame, text=f"שורה {line_num}", 
@@ -317,143 +416,125 @@ class GroundTruthEditor:
                 row=row, column=0, padx=5, pady=2, sticky='w')
             
             # שדות השורה
-            col = 1
-            for field in fields:
-                if field == 'line':
-                    continue
-                
-                entry_key = f"{line_key}_{field}"
-                entry = ttk.Entry(data_frame, width=15)
+            entry_keys = self._entry_keys[line_key]
+            for col, field in enumerate(self._data_fields, start=1):
+                entry = tk.Entry(data_frame, width=15, relief='solid', bd=1)
                 entry.grid(row=row, column=col, padx=2, pady=2, sticky='ew')
                 
                 # הוספת תמיכה בהעתק-הדבק מקלדת
-                self.add_copy_paste_support(entry)
+                entry.bindtags((_CELL_TAG,) + entry.bindtags())
                 
-                self.entries[entry_key] = entry
-                col += 1
+                self.entries[entry_keys[field]] = entry
             
             row += 1
         
-        # הגדרת משקלי עמודות להתרחבות
-        for i in range(len(fields)):
-            data_frame.columnconfigure(i, weight=1)
+        # הגדרת משקלי עמודות להתרחבות - קריאה אחת לכל העמודות
+        data_frame.columnconfigure(tuple(range(len(self._data_fields) + 1)), weight=1)
     
     def bind_mouse_scroll(self, canvas):
-        """הוספת תמיכה בגלילה עם עכבר"""
-        def on_mouse_wheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        
-        def bind_to_mousewheel(event):
-            canvas.bind_all("<MouseWheel>", on_mouse_wheel)
+        """הוספת תמיכה בגלילה עם עכבר - בחלון העריכה בלבד ולא דרך bind_all.
+        ה-Toplevel מופיע ב-bindtags של כל צאצאיו, ובכך גם בווידג'ט הממוקד ב-Windows;
+        גוללים רק כשהסמן מעל אזור ה-canvas (תאים, תוויות, רווחים) ולא מעל Combobox התבניות וכו'"""
+        canvas_path = str(canvas)
+        canvas_prefix = canvas_path + "."
         
-        def unbind_from_mousewheel(event):
-            canvas.unbind_all("<MouseWheel>")
-        
-        canvas.bind('<Enter>', bind_to_mousewheel)
-        canvas.bind('<Leave>', unbind_from_mousewheel)
-    
-    def add_copy_paste_support(self, entry_widget):
-        """הוספת תמיכה בהעתק-הדבק למיקרו widget"""
-        def copy_text(event=None):
+        def on_mouse_wheel(event):
             try:
-                entry_widget.clipboard_clear()
-                if entry_widget.selection_present():
-                    text = entry_widget.selection_get()
-                else:
-                    text = entry_widget.get()
-                entry_widget.clipboard_append(text)
-                return "break"
-            except:
-                pass
+                hovered = self.window.winfo_containing(event.x_root, event.y_root)
+            except KeyError:
+                return  # ווידג'ט פנימי של Tk (למשל רשימה נפתחת של Combobox)
+            if hovered is None:
+                return
+            path = str(hovered)
+            if path == canvas_path or path.startswith(canvas_prefix):
+                canvas.yview_scroll(int(-1*(event.delta/120)), "units")
         
-        def paste_text(event=None):
-            try:
-                clipboard_text = entry_widget.clipboard_get()
-                cleaned_text = self.clean_quotes(clipboard_text)
-                if entry_widget.selection_present():
-                    entry_widget.delete(tk.SEL_FIRST, tk.SEL_LAST)
-                entry_widget.insert(tk.INSERT, cleaned_text)
-                return "break"
-            except:
-                pass
-        
-        # קישור קיצורי המקלדת
-        entry_widget.bind('<Control-c>', copy_text)
-        entry_widget.bind('<Control-v>', paste_text)
+        self.window.bind('<MouseWheel>', on_mouse_wheel)
+    
+    def _on_copy_cell(self, event):
+        """העתקת הבחירה (או כל התוכן) של התא הממוקד"""
+        entry_widget = event.widget
+        try:
+            entry_widget.clipboard_clear()
+            if entry_widget.selection_present():
+                text = entry_widget.selection_get()
+            else:
+                text = entry_widget.get()
+            entry_widget.clipboard_append(text)
+            return "break"
+        except:
+            pass
+    
+    def _on_paste_cell(self, event):
+        """הדבקה לתא הממוקד עם ניקוי מרכאות"""
+        entry_widget = event.widget
+        try:
+            clipboard_text = entry_widget.clipboard_get()
+            cleaned_text = self.clean_quotes(clipboard_text)
+            if entry_widget.selection_present():
+                entry_widget.delete(tk.SEL_FIRST, tk.SEL_LAST)
+            entry_widget.insert(tk.INSERT, cleaned_text)
+            return "break"
+        except:
+            pass
     
     def clean_quotes(self, text: str) -> str:
         """ניקוי מרכאות מתחילה וסוף הטקסט"""
         text = text.strip()
-        if (text.startswith('"') and text.endswith('"')) or \
-           (text.startswith("'") and text.endswith("'")):
+        if text and text[0] == text[-1] and text[0] in _QUOTE_CHARS:
             return text[1:-1]
         return text
     
     def copy_all_data(self):
         """העתק כל הנתונים ללוח"""
         try:
-            all_data = []
-            template = self.template_data['template']
+            all_data = self.collect_current_data()
             
-            for line_key in sorted(template.keys()):
-                line_data = {}
-                line_num = int(line_key.split('_')[1])
-                line_data['line'] = line_num
-                
-                for field in self.template_data['fields']:
-                    if field == 'line':
-                        continue
-                    
-                    entry_key = f"{line_key}_{field}"
-                    if entry_key in self.entries:
-                        value = self.entries[entry_key].get().strip()
-                        if value:
-                            line_data[field] = self.convert_to_number(value)
-                
-                all_data.append(line_data)
-            
-            json_text = json.dumps(all_data, ensure_ascii=False, indent=2)
-            self.window.clipboard_clear()
-            self.window.clipboard_append(json_text)
-            messagebox.showinfo("הצלחה", "כל הנתונים הועתקו ללוח")
+            json_text = dumps(all_data).decode('utf-8')
+            w = self.window
+            w.clipboard_clear()
+            w.clipboard_append(json_text, type='STRING')
+            self._showinfo("הצלחה", "כל הנתונים הועתקו ללוח")
             
         except Exception as e:
-            messagebox.showerror("שגיאה", f"שגיאה בהעתקה: {str(e)}")
+            self._showerror("שגיאה", f"שגיאה בהעתקה: {str(e)}")
     
     def paste_all_data(self):
         """הדבק נתונים מהלוח"""
         try:
-            clipboard_text = self.window.clipboard_get()
-            data = json.loads(clipboard_text)
+            clipboard_text = self.window.clipboard_get(type='STRING')
+            data = loads(clipboard_text)
             
             if isinstance(data, list):
                 self.load_data_to_entries(data)
-                messagebox.showinfo("הצלחה", "הנתונים הודבקו בהצלחה")
+                self._showinfo("הצלחה", "הנתונים הודבקו בהצלחה")
             else:
-                messagebox.showerror("שגיאה", "פורמט נתונים לא תקין")
+                self._showerror("שגיאה", "פורמט נתונים לא תקין")
                 
         except Exception as e:
-            messagebox.showerror("שגיאה", f"שגיאה בהדבקה: {str(e)}")
+            self._showerror("שגיאה", f"שגיאה בהדבקה: {str(e)}")
     
     def load_data_to_entries(self, data: List[Dict[str, Any]]):
         """טעינת נתונים לשדות העריכה"""
+        entries = self.entries
+        entry_keys_by_line = self._entry_keys
+        clean_quotes = self.clean_quotes
+        
         # ניקוי שדות קיימים
-        for entry in self.entries.values():
+        for entry in entries.values():
             entry.delete(0, tk.END)
         
-        # מילוי נתונים חדשים
+        # מילוי נתונים חדשים - מפתחות ה-Entry כבר מחושבים, ורק מחרוזות עוברות ניקוי מרכאות
         for item in data:
-            line_num = item.get('line', 1)
-            line_key = f"line_{line_num}"
+            entry_keys = entry_keys_by_line.get(f"line_{item.get('line', 1)}")
+            if entry_keys is None:
+                continue
             
             for field, value in item.items():
-                if field == 'line':
-                    continue
-                
-                entry_key = f"{line_key}_{field}"
-                if entry_key in self.entries:
-                    cleaned_value = self.clean_quotes(str(value))
-                    self.entries[entry_key].insert(0, cleaned_value)
+                entry_key = entry_keys.get(field)
+                if entry_key is not None and entry_key in entries:
+                    cleaned_value = clean_quotes(value) if isinstance(value, str) else str(value)
+                    entries[entry_key].insert(0, cleaned_value)
     
     def convert_to_number(self, value: str):
         """המרה למספר אם אפשר"""
@@ -461,44 +542,39 @@ class GroundTruthEditor:
         if not value:
             return value
         
-        try:
-            if '.' in value or ',' in value:
-                value = value.replace(',', '.')
-                return float(value)
-            else:
-                return int(value)
-        except ValueError:
-            return value
+        if _INT_MATCH(value):
+            return int(value)
+        if _FLOAT_MATCH(value):
+            return float(value.replace(',', '.'))
+        return value
     
     def save_as_template(self):
         """שמירה כתבנית"""
         template_name = self.template_name_var.get().strip()
         if not template_name:
-            messagebox.showwarning("שגיאה", "יש להזין שם לתבנית")
+            self._showwarning("שגיאה", "יש להזין שם לתבנית")
             return
         
         ground_truth_data = self.collect_current_data()
         success = self.source_manager.save_source_template(template_name, ground_truth_data)
         
         if success:
-            saved_sources = list(self.source_manager.get_saved_sources().keys())
-            self.template_combo['values'] = saved_sources
-            messagebox.showinfo("הצלחה", f"התבנית '{template_name}' נשמרה בהצלחה")
+            self.template_combo['values'] = self.source_manager.get_saved_source_names()
+            self._showinfo("הצלחה", f"התבנית '{template_name}' נשמרה בהצלחה")
         else:
-            messagebox.showerror("שגיאה", "שגיאה בשמירת התבנית")
+            self._showerror("שגיאה", "שגיאה בשמירת התבנית")
     
     def load_selected_template(self):
         """טעינת תבנית נבחרת"""
         template_name = self.template_var.get()
         if not template_name:
-            messagebox.showwarning("שגיאה", "יש לבחור תבנית")
+            self._showwarning("שגיאה", "יש לבחור תבנית")
             return
         
-        saved_sources = self.source_manager.get_saved_sources()
-        if template_name in saved_sources:
-            template_data = saved_sources[template_name]
+        template_data = self.source_manager.get_template(template_name)
+        if template_data is not None:
             self.load_data_to_entries(template_data)
-            messagebox.showinfo("הצלחה", f"התבנית '{template_name}' נטענה בהצלחה")
+            self._showinfo("הצלחה", f"התבנית '{template_name}' נטענה בהצלחה")
     
     def load_template(self, event=None):
         """טעינת תבנית עם אירוע combo"""
@@ -507,24 +583,23 @@ class GroundTruthEditor:
     def collect_current_data(self) -> List[Dict[str, Any]]:
         """איסוף הנתונים הנוכחיים"""
         ground_truth_data = []
-        template = self.template_data['template']
+        entries = self.entries
+        line_index = self._line_index
         
-        for line_key in sorted(template.keys()):
-            line_num = int(line_key.split('_')[1])
-            line_data = {'line': line_num}
+        for line_key in self._sorted_line_keys:
+            line_data = {'line': line_index[line_key]}
+            entry_keys = self._entry_keys[line_key]
             
-            for field in self.template_data['fields']:
-                if field == 'line':
-                    continue
-                
-                entry_key = f"{line_key}_{field}"
-                if entry_key in self.entries:
-                    value = self.entries[entry_key].get().strip()
+            for field in self._data_fields:
+                entry = entries.get(entry_keys[field])
+                if entry is not None:
+                    value = entry.get().strip()
                     if value:
-                        converted_value = self.convert_to_number(value)
-                        line_data[field] = converted_value
+                        line_data[field] = self.convert_to_number(value)
             
-            ground_truth_data.append(line_data)
+            # שורות ללא אף ערך לא נכללות
+            if len(line_data) > 1:
+                ground_truth_data.append(line_data)
         
         return ground_truth_data
     
@@ -532,6 +607,12 @@ class GroundTruthEditor:
         """שמירת נתוני Ground Truth"""
         ground_truth_data = self.collect_current_data()
         self.callback(ground_truth_data)
+        self._on_close()
+    
+    def _on_close(self):
+        """סגירת העורך ושחרור ההפניות לכל תאי העריכה"""
+        self.entries.clear()
+        self._entry_keys.clear()
         self.window.destroy()
 
 
@@ -542,6 +623,18 @@ class EnhancedValidationGUI:
         self.root = tk.Tk()
         self.processor = EnhancedValidationProcessor()
         self.source_manager = SourceDataManager()
+        self._gt_cache = OrderedDict()  # {(path, mtime_ns, size): ground_truth_data}
+        self._report_stream_id = 0  # מזהה ההזרמה הפעילה של הדוח
+        self._validation_in_flight = False
+        # השיטה שבה רצה הוולידציה האחרונה - נקבעת בהגשה ומשמשת להצגת התוצאות שלה
+        self._last_method = self.processor.get_validation_method()
+        self._loads_in_flight = 0  # טעינות קבצים שנקראות ברקע וטרם הוחלו
+        self._load_generation = 0  # מתקדם ב-clear_all; טעינה מדור קודם לא מוחלת
+        
+        # חוט עבודה קבוע לטעינה ולוולידציה במקום חוט חדש בכל לחיצה
+        self._jobs = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+        
         self.setup_window()
         self.create_widgets()
         
@@ -790,17 +883,37 @@ class EnhancedValidationGUI:
         if not filenames:
             return
         
-        load_results = self.processor.load_json_files(list(filenames))
+        self.status_var.set("טוען...")
         
-        # עדכון רשימת הקבצים
+        # קריאת הקבצים ופענוחם ברקע, בלי לגעת במצב המעבד; ההחלה נעשית בחוט של Tk
+        paths = list(filenames)
+        generation = self._load_generation
+        self._loads_in_flight += 1
+        self._submit(lambda: self.processor.read_json_files(paths),
+                     lambda loaded: self._apply_load_results(paths, loaded, generation),
+                     self.on_load_error)
+    
+    def _apply_load_results(self, paths: List[str], loaded: List[tuple], generation: int):
+        """החלת הקבצים שנקראו על המעבד ועדכון הממשק (בחוט של Tk)"""
+        self._loads_in_flight -= 1
+        if generation != self._load_generation:
+            return  # הנתונים נוקו בזמן הקריאה
+        load_results = self.processor.apply_loaded_files(paths, loaded)
+        
+        # עדכון רשימת הקבצים - הכנסה אחת לכל השורות
+        lines = [f"{'✓' if success else '✗'} {file_key}" for file_key, success in load_results.items()]
         self.files_listbox.delete(0, tk.END)
-        for file_key, success in load_results.items():
-            status = "✓" if success else "✗"
-            self.files_listbox.insert(tk.END, f"{status} {file_key}")
+        self.files_listbox.insert(tk.END, *lines)
         
         self.update_run_button()
         self.status_var.set(f"נטענו {sum(load_results.values())} מתוך {len(load_results)} קבצים")
     
+    def on_load_error(self, error_msg):
+        """טיפול בשגיאות טעינת קבצים"""
+        self._loads_in_flight -= 1
+        self.status_var.set("טעינת הקבצים נכשלה")
+        messagebox.showerror("שגיאה", f"שגיאה בטעינת הקבצים: {error_msg}")
+    
     def load_ground_truth_file(self):
         """טעינת קובץ Ground Truth"""
         filename = filedialog.askopenfilename(
@@ -809,7 +922,7 @@ class EnhancedValidationGUI:
         )
         
         if filename:
-            success = self.processor.load_ground_truth(filename)
+            success = self._load_gt_cached(filename)
             if success:
                 gt_count = len(self.processor.ground_truth_data)
                 self.gt_status_var.set(f"נתוני מקור נטענו: {gt_count} שורות")
@@ -819,8 +932,37 @@ class EnhancedValidationGUI:
                 self.gt_status_var.set("שגיאה בטעינת נתוני מקור")
                 messagebox.showerror("שגיאה", "שגיאה בטעינת קובץ נתוני המקור")
     
+    def _load_gt_cached(self, path: str) -> bool:
+        """טעינת Ground Truth מקובץ, עם מטמון לפי נתיב, זמן שינוי וגודל"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            # הקובץ נמחק/ננעל אחרי בחירתו - מדווח כמו כל כשל טעינה אחר
+            return False
+        key = (path, st.st_mtime_ns, st.st_size)
+        
+        cached = self._gt_cache.get(key)
+        if cached is not None:
+            self._gt_cache.move_to_end(key)
+            return self.processor.load_ground_truth(ground_truth_data=cached)
+        
+        success = self.processor.load_ground_truth(path)
+        if success and self.processor.ground_truth_data:
+            self._gt_cache[key] = self.processor.ground_truth_data
+            if len(self._gt_cache) > GT_CACHE_SIZE:
+                self._gt_cache.popitem(last=False)
+        return success
+    
     def run_validation(self):
         """הרצת תהליך וולידציה"""
+        # וולידציה כבר רצה - לא מריצים שוב (לחיצה כפולה / קיצור מקלדת)
+        if self._validation_in_flight:
+            return
+        # קבצים עדיין נקראים ברקע - הוולידציה תרוץ על מצב שעומד להשתנות
+        if self._loads_in_flight:
+            self.status_var.set("ממתין לסיום טעינת הקבצים...")
+            return
+        
         if not self.processor.can_run_validation():
             messagebox.showwarning("אזהרה", "לא ניתן להריץ וולידציה - חסרים נתונים")
             return
@@ -828,19 +970,29 @@ class EnhancedValidationGUI:
         self.run_button.config(state='disabled', text="מריץ...")
         self.status_var.set("מריץ וולידציה...")
         
-        def run_in_background():
+        self._validation_in_flight = True
+        self._last_method = self.processor.get_validation_method()
+        self._submit(self.processor.run_validation,
+                     self.on_validation_complete, self.on_validation_error)
+    
+    def _submit(self, job, on_done, on_error):
+        """הוספת משימה לתור חוט העבודה"""
+        self._jobs.put((job, on_done, on_error))
+    
+    def _worker(self):
+        """מריץ משימות מהתור ומחזיר תוצאה או הודעת שגיאה ל-Tk דרך after"""
+        while True:
+            job, on_done, on_error = self._jobs.get()
             try:
-                results = self.processor.run_validation()
-                self.root.after(0, lambda: self.on_validation_complete(results))
+                result = job()
             except Exception as e:
-                self.root.after(0, lambda: self.on_validation_error(str(e)))
-        
-        thread = threading.Thread(target=run_in_background)
-        thread.daemon = True
-        thread.start()
+                self.root.after(0, on_error, str(e))
+            else:
+                self.root.after(0, on_done, result)
     
     def on_validation_complete(self, results):
         """טיפול בהשלמת וולידציה"""
+        self._validation_in_flight = False
         self.run_button.config(state='normal', text="הרץ וולידציה")
         self.status_var.set("וולידציה הושלמה בהצלחה")
         
@@ -851,57 +1003,75 @@ class EnhancedValidationGUI:
     
     def on_validation_error(self, error_msg):
         """טיפול בשגיאות וולידציה"""
+        self._validation_in_flight = False
         self.run_button.config(state='normal', text="הרץ וולידציה")
         self.status_var.set("וולידציה נכשלה")
         messagebox.showerror("שגיאה", f"וולידציה נכשלה: {error_msg}")
     
     def update_results_display(self, results):
         """עדכון תצוגת התוצאות"""
+        tree = self.summary_tree
+        
         # ניקוי הטבלה
-        for item in self.summary_tree.get_children():
-            self.summary_tree.delete(item)
+        tree.delete(*tree.get_children())
         
-        method = self.processor.get_validation_method()
+        # השיטה שנשמרה בהרצה - גם אם המשתמש החליף שיטה בזמן שהוולידציה רצה
+        method = self._last_method
         
-        if method == ValidationMethod.CHARACTER_LEVEL:
-            self.update_character_results(results)
-        elif method == ValidationMethod.BUSINESS_LOGIC:
-            self.update_business_results(results)
-        elif method == ValidationMethod.BOTH:
-            self.update_combined_results(results)
+        # הסתרת העמודות בזמן ההכנסה כדי שרוחבי העמודות יחושבו פעם אחת בסוף
+        display_columns = tree['displaycolumns']
+        tree.configure(displaycolumns=())
+        try:
+            if method == ValidationMethod.CHARACTER_LEVEL:
+                self.update_character_results(results.get('kpi_results', {}))
+            elif method == ValidationMethod.BUSINESS_LOGIC:
+                self.update_business_results(results.get('business_results', {}))
+            elif method == ValidationMethod.BOTH:
+                self.update_combined_results(results.get('combined_analysis', {}))
+        finally:
+            tree.configure(displaycolumns=display_columns)
         
         # עדכון דוח
         report = results.get('detailed_report', 'אין דוח זמין')
-        self.report_text.delete(1.0, tk.END)
-        self.report_text.insert(1.0, report)
+        self._stream_report(report)
     
-    def update_character_results(self, results):
+    def _stream_report(self, text: str, pos: int = 0, stream_id: Optional[int] = None):
+        """הכנסת הדוח במקטעים דרך after_idle כדי שהממשק ימשיך להגיב בדוחות גדולים"""
+        end = pos + REPORT_CHUNK_SIZE
+        if pos == 0:
+            self._report_stream_id += 1
+            stream_id = self._report_stream_id
+            self.report_text.replace('1.0', tk.END, text[:end])
+        elif stream_id != self._report_stream_id:
+            return  # דוח חדש יותר החליף את זה
+        else:
+            self.report_text.insert(tk.END, text[pos:end])
+        
+        if end < len(text):
+            self.root.after_idle(self._stream_report, text, end, stream_id)
+    
+    def _bulk_insert(self, rows):
+        """הכנסת שורות מוכנות (טקסט, ערכים) לטבלת הסיכום"""
+        insert = self.summary_tree.insert
+        for text, values in rows:
+            insert('', 'end', text=text, values=values)
+    
+    def update_character_results(self, kpi_results: Dict[str, Any]):
         """עדכון תוצאות השוואת תווים"""
-        kpi_results = results.get('kpi_results', {})
-        for file_key, file_results in kpi_results.items():
-            accuracy = f"{file_results['overall_accuracy']:.1%}"
-            self.summary_tree.insert('', 'end', text=file_key, values=(accuracy, "תווים"))
+        self._bulk_insert([(file_key, (f"{file_results['overall_accuracy']:.1%}", "תווים"))
+                           for file_key, file_results in kpi_results.items()])
     
-    def update_business_results(self, results):
+    def update_business_results(self, business_results: Dict[str, Any]):
         """עדכון תוצאות וולידציה עסקית"""
-        business_results = results.get('business_results', {})
-        for file_key, file_results in business_results.items():
-            if file_results.get('success', False):
-                score = f"{file_results['score']}/100"
-                status = file_results['status']
-            else:
-                score = "כשל"
-                status = "שגיאה"
-            self.summary_tree.insert('', 'end', text=file_key, values=(score, status))
+        self._bulk_insert([(file_key, (f"{file_results['score']}/100", file_results['status'])
+                                      if file_results.get('success', False) else ("כשל", "שגיאה"))
+                           for file_key, file_results in business_results.items()])
     
-    def update_combined_results(self, results):
+    def update_combined_results(self, combined: Dict[str, Any]):
         """עדכון תוצאות משולבות"""
-        combined = results.get('combined_analysis', {})
         files_analysis = combined.get('files_analysis', {})
-        
-        for file_key, analysis in files_analysis.items():
-            combined_score = analysis.get('combined_score', 'N/A')
-            self.summary_tree.insert('', 'end', text=file_key, values=(combined_score, "משולב"))
+        self._bulk_insert([(file_key, (analysis.get('combined_score', 'N/A'), "משולב"))
+                           for file_key, analysis in files_analysis.items()])
     
     def update_run_button(self):
         """עדכון מצב כפתור הרצה"""
@@ -910,13 +1080,14 @@ class EnhancedValidationGUI:
     
     def clear_all(self):
         """ניקוי כל הנתונים"""
+        self._load_generation += 1
         self.processor.clear_data()
         self.files_listbox.delete(0, tk.END)
         self.gt_status_var.set("לא נטענו נתוני מקור")
         
-        for item in self.summary_tree.get_children():
-            self.summary_tree.delete(item)
+        self.summary_tree.delete(*self.summary_tree.get_children())
         
+        self._report_stream_id += 1
         self.report_text.delete(1.0, tk.END)
         self.update_run_button()
         self.status_var.set("כל הנתונים נוקו")
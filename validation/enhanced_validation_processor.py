@@ -2,14 +2,38 @@
 enhanced_validation_processor.py - מעבד תהליכי וולידציה מעודכן עם תמיכה בשתי שיטות
 """
 
-import json
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 
 from character_kpi_calculator import CharacterKPICalculator
 from business_validation_adapter import BusinessValidationAdapter
+from validation.json_io import dump_path, dumps, load_path, stream_items
+
+# מיקומי רשימת השורות בקובץ Ground Truth, לפי סדר עדיפות
+GROUND_TRUTH_PREFIXES = ('item', 'ground_truth.item', 'main_items.item', 'main.main_items.item')
+# מעל גודל זה קובץ ה-Ground Truth נקרא בזרימה (ijson); קבצים קטנים יותר נטענים מהר יותר במלואם
+GROUND_TRUTH_STREAM_MIN_BYTES = 10 * 1024 * 1024
+
+# שדות סטנדרטיים שתמיד חייבים להיות ב-template, לפי סדר התצוגה
+TEMPLATE_STANDARD_FIELDS = (
+    'barcode', 'item_code', 'description', 'quantity',
+    'unit_price', 'discount_percent', 'price_after_discount', 'total_amount'
+)
+
+# מספר תוצאות וולידציה שנשמרות במטמון לפי תוכן הקלט
+VALIDATION_CACHE_SIZE = 8
+
+
+@lru_cache(maxsize=4096)
+def format_percent(value: float) -> str:
+    """עיצוב אחוז עם ספרה אחת אחרי הנקודה; ערכים חוזרים (1.0, 0.0...) נשלפים מהמטמון"""
+    return f"{value:.1%}"
 
 
 class ValidationMethod(Enum):
@@ -30,11 +54,28 @@ class EnhancedValidationProcessor:
         self.validation_results = None
         self.extracted_files_data = {}  # נתונים מחולצים מהקבצים
         self.validation_method = ValidationMethod.CHARACTER_LEVEL  # ברירת מחדל
+        self._update_method_flags()
+        # מטמוני תוצאות לפי טביעת אצבע של הקלט - נפרדים לכל שיטה
+        self._char_cache = OrderedDict()  # {(gt_fp, files_fp): results}
+        self._biz_cache = OrderedDict()   # {files_fp: results}
+        self._fields_cache = None  # (all_fields, line_numbers) מהקבצים הטעונים
+        self._lines_per_file = {}  # {file_key: set(line numbers)} - נאסף בזמן הטעינה
+        self._gt_by_field_cache = None
         
     def set_validation_method(self, method: ValidationMethod):
         """הגדרת שיטת הוולידציה"""
         self.validation_method = method
-        self.kpi_calculator.log(f"Validation method set to: {method.value}", "INFO")
+        self._update_method_flags()
+        self.kpi_calculator.log(f"Validation method set to: {self._method_value}", "INFO")
+    
+    def _update_method_flags(self):
+        """חישוב מראש של החלטות ההסתעפות לפי השיטה הנבחרת"""
+        method = self.validation_method
+        self._is_char = method is ValidationMethod.CHARACTER_LEVEL
+        self._is_business = method is ValidationMethod.BUSINESS_LOGIC
+        self._is_both = method is ValidationMethod.BOTH
+        self._needs_gt = self._is_char or self._is_both
+        self._method_value = method.value
     
     def get_validation_method(self) -> ValidationMethod:
         """קבלת שיטת הוולידציה הנוכחית"""
@@ -42,24 +83,41 @@ class EnhancedValidationProcessor:
         
     def load_json_files(self, file_paths: List[str]) -> Dict[str, bool]:
         """טעינת קבצי JSON (1-5 קבצים)"""
+        return self.apply_loaded_files(file_paths, self.read_json_files(file_paths))
+    
+    def read_json_files(self, file_paths: List[str]) -> List[tuple]:
+        """קריאה ופענוח של הקבצים בלבד, ללא שינוי מצב המעבד - בטוח להרצה מחוט רקע.
+        מחזיר [(data, error)] לפי סדר הקבצים, להעברה ל-apply_loaded_files"""
         if len(file_paths) > 5:
             raise ValueError("Maximum 5 JSON files allowed")
         
+        # קריאה ופענוח של הקבצים במקביל; הסדר נשמר ע"י map. קובץ בודד (או אף אחד) - בלי pool
+        if len(file_paths) > 1:
+            with ThreadPoolExecutor(max_workers=len(file_paths)) as pool:
+                return list(pool.map(self._load_one_json, file_paths))
+        return [self._load_one_json(file_path) for file_path in file_paths]
+    
+    def apply_loaded_files(self, file_paths: List[str], loaded: List[tuple]) -> Dict[str, bool]:
+        """החלפת הקבצים הטעונים בתוצאות read_json_files - יש לקרוא מהחוט שמחזיק את המעבד"""
         results = {}
         self.loaded_files.clear()
         self.extracted_files_data.clear()
+        self._lines_per_file.clear()
+        self._fields_cache = None
         
-        for file_path in file_paths:
+        # עדכון המצב והלוג לפי סדר הקבצים
+        for file_path, (data, error) in zip(file_paths, loaded):
             try:
-                file_key = Path(file_path).stem
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                if error is not None:
+                    raise error
                 
+                file_key = Path(file_path).stem
                 self.loaded_files[file_key] = data
                 
                 # חילוץ main_items מיד
                 extracted_items = self.kpi_calculator.extract_main_items(data)
                 self.extracted_files_data[file_key] = extracted_items
+                self._lines_per_file[file_key] = {item.get('line', 1) for item in extracted_items}
                 
                 results[file_key] = True
                 self.kpi_calculator.log(f"Loaded file: {file_key} ({len(extracted_items)} items)", "INFO")
@@ -71,26 +129,29 @@ class EnhancedValidationProcessor:
         self.kpi_calculator.log(f"Total files loaded: {len(self.loaded_files)}", "INFO")
         return results
     
+    @staticmethod
+    def _load_one_json(file_path: str):
+        """קריאה ופענוח של קובץ בודד - מחזיר (data, error)"""
+        try:
+            return load_path(file_path), None
+        except Exception as e:
+            return None, e
+    
     def load_ground_truth(self, ground_truth_path: str = None, 
                          ground_truth_data: List[Dict[str, Any]] = None) -> bool:
         """טעינת נתוני Ground Truth - נדרש רק לוולידציה ברמת תווים"""
+        self._gt_by_field_cache = None
         try:
             if ground_truth_path:
-                with open(ground_truth_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # חילוץ main_items מקובץ Ground Truth
-                if isinstance(data, dict):
-                    if 'ground_truth' in data:
-                        self.ground_truth_data = data['ground_truth']
-                    elif 'main_items' in data:
-                        self.ground_truth_data = data['main_items']
-                    elif 'main' in data and 'main_items' in data['main']:
-                        self.ground_truth_data = data['main']['main_items']
-                    else:
-                        self.ground_truth_data = [data]  # קובץ בודד
-                elif isinstance(data, list):
-                    self.ground_truth_data = data
+                # קובץ גדול: קריאה זורמת של השורות בלבד, ללא טעינת כל העץ לזיכרון
+                streamed = None
+                if Path(ground_truth_path).stat().st_size >= GROUND_TRUTH_STREAM_MIN_BYTES:
+                    streamed = stream_items(ground_truth_path, GROUND_TRUTH_PREFIXES)
+                if streamed is not None:
+                    self.ground_truth_data = streamed
+                else:
+                    data = load_path(ground_truth_path)
+                    self.ground_truth_data = self._extract_ground_truth_items(data)
                     
                 self.kpi_calculator.log(f"Ground truth loaded from file: {len(self.ground_truth_data)} lines", "INFO")
                 
@@ -104,9 +165,24 @@ class EnhancedValidationProcessor:
             self.kpi_calculator.log(f"Failed to load ground truth: {str(e)}", "ERROR")
             return False
     
+    def _extract_ground_truth_items(self, data: Any) -> List[Dict[str, Any]]:
+        """חילוץ main_items מקובץ Ground Truth שנטען במלואו"""
+        if isinstance(data, dict):
+            if 'ground_truth' in data:
+                return data['ground_truth']
+            elif 'main_items' in data:
+                return data['main_items']
+            elif 'main' in data and 'main_items' in data['main']:
+                return data['main']['main_items']
+            else:
+                return [data]  # קובץ בודד
+        elif isinstance(data, list):
+            return data
+        return self.ground_truth_data
+    
     def is_ground_truth_required(self) -> bool:
         """בדיקה האם נדרש Ground Truth לשיטת הוולידציה הנבחרת"""
-        return self.validation_method in [ValidationMethod.CHARACTER_LEVEL, ValidationMethod.BOTH]
+        return self._needs_gt
     
     def can_run_validation(self) -> bool:
         """בדיקה האם ניתן להריץ וולידציה"""
@@ -114,7 +190,7 @@ class EnhancedValidationProcessor:
             return False
         
         # אם נבחרה וולידציה עסקית בלבד, לא נדרש Ground Truth
-        if self.validation_method == ValidationMethod.BUSINESS_LOGIC:
+        if self._is_business:
             return True
         
         # אחרת נדרש Ground Truth
@@ -122,43 +198,20 @@ class EnhancedValidationProcessor:
     
     def extract_all_fields_template(self) -> Dict[str, List[str]]:
         """חילוץ template של כל השדות מהקבצים הטעונים"""
-        # שדות סטנדרטיים שתמיד חייבים להיות
-        standard_fields = [
-            'barcode', 'item_code', 'description', 'quantity', 
-            'unit_price', 'discount_percent', 'price_after_discount', 'total_amount'
-        ]
+        # שדות ומספרי שורות מהקבצים (מהאינדקס השמור)
+        file_fields, file_lines = self._ensure_field_index()
         
-        all_fields = set(standard_fields)
-        line_numbers = set()
-        
-        # איסוף שדות נוספים מהקבצים
-        for file_key, items in self.extracted_files_data.items():
-            for item in items:
-                all_fields.update(item.keys())
-                line_numbers.add(item.get('line', 1))
+        # השדות הסטנדרטיים ראשונים, ואחריהם שדות נוספים שנמצאו (ממוינים)
+        extras = file_fields.difference(TEMPLATE_STANDARD_FIELDS)
+        extras.discard('line')
+        final_fields = [*TEMPLATE_STANDARD_FIELDS, *sorted(extras)]
         
         # וידוא שיש לפחות שורה אחת אם אין קבצים
-        if not line_numbers:
-            line_numbers.add(1)
-        
-        # יצירת template לכל שורה עם כל השדות הסטנדרטיים
-        template = {}
-        sorted_lines = sorted(line_numbers)
-        sorted_fields = sorted([field for field in all_fields if field != 'line'])
-        
-        # וידוא שהשדות הסטנדרטיים נמצאים ראשונים
-        final_fields = []
-        for field in standard_fields:
-            if field in sorted_fields:
-                final_fields.append(field)
-        
-        # הוספת שדות נוספים שאולי נמצאו
-        for field in sorted_fields:
-            if field not in standard_fields:
-                final_fields.append(field)
+        sorted_lines = sorted(file_lines) if file_lines else [1]
         
-        for line_num in sorted_lines:
-            template[f"line_{line_num}"] = {field: "" for field in final_fields}
+        # יצירת template לכל שורה עם כל השדות - העתקה של אב-טיפוס אחד
+        proto = dict.fromkeys(final_fields, "")
+        template = {f"line_{line_num}": proto.copy() for line_num in sorted_lines}
         
         self.kpi_calculator.log(f"Generated template: {len(sorted_lines)} lines, {len(final_fields)} fields (including all standard fields)", "INFO")
         return {
@@ -172,25 +225,29 @@ class EnhancedValidationProcessor:
         if not self.extracted_files_data:
             raise ValueError("No JSON files loaded")
         
+        method_str = self._method_value
         validation_results = {
-            'method_used': self.validation_method.value,
+            'method_used': method_str,
             'timestamp': datetime.now().isoformat(),
             'files_processed': len(self.extracted_files_data)
         }
         
-        self.kpi_calculator.log(f"Starting validation process with method: {self.validation_method.value}", "INFO")
+        self.kpi_calculator.log(f"Starting validation process with method: {method_str}", "INFO")
+        
+        # טביעת האצבע של הקבצים מחושבת פעם אחת ומשמשת את שני המטמונים
+        files_fp = self._files_fingerprint()
         
         # הרצת וולידציה לפי השיטה הנבחרת
-        if self.validation_method == ValidationMethod.CHARACTER_LEVEL:
-            validation_results.update(self.run_character_validation())
+        if self._is_char:
+            validation_results.update(self.run_character_validation(files_fp))
             
-        elif self.validation_method == ValidationMethod.BUSINESS_LOGIC:
-            validation_results.update(self.run_business_validation())
+        elif self._is_business:
+            validation_results.update(self.run_business_validation(files_fp))
             
-        elif self.validation_method == ValidationMethod.BOTH:
-            # הרצת שתי הוולידציות
-            char_results = self.run_character_validation()
-            business_results = self.run_business_validation()
+        elif self._is_both:
+            # הרצת שתי הוולידציות (כל אחת מדלגת על החישוב אם הקלט לא השתנה)
+            char_results = self.run_character_validation(files_fp)
+            business_results = self.run_business_validation(files_fp)
             
             # שילוב התוצאות
             validation_results.update({
@@ -205,13 +262,21 @@ class EnhancedValidationProcessor:
         self.kpi_calculator.log("Validation process completed", "INFO")
         return validation_results
     
-    def run_character_validation(self) -> Dict[str, Any]:
+    def run_character_validation(self, files_fp: Optional[tuple] = None) -> Dict[str, Any]:
         """הרצת וולידציה ברמת תווים"""
         if not self.ground_truth_data:
             raise ValueError("No ground truth data available for character-level validation")
         
         self.kpi_calculator.log("Running character-level validation", "INFO")
         
+        if files_fp is None:
+            files_fp = self._files_fingerprint()
+        gt_fp = self._fingerprint(self.ground_truth_data)
+        cache_key = (gt_fp, files_fp) if gt_fp is not None and files_fp is not None else None
+        cached = self._cache_get(self._char_cache, cache_key, 'character')
+        if cached is not None:
+            return dict(cached, character_logs=self.kpi_calculator.get_logs())
+        
         # הרצת חישוב KPIs
         kpi_results = self.kpi_calculator.calculate_global_kpis(
             self.ground_truth_data, 
@@ -224,7 +289,7 @@ class EnhancedValidationProcessor:
         # הכנת נתונים לטבלה המורחבת
         expanded_table_data = self.prepare_expanded_table_data(kpi_results)
         
-        return {
+        char_results = {
             'type': 'character_level',
             'kpi_results': kpi_results,
             'detailed_report': detailed_report,
@@ -232,11 +297,18 @@ class EnhancedValidationProcessor:
             'ground_truth_lines': len(self.ground_truth_data),
             'character_logs': self.kpi_calculator.get_logs()
         }
+        self._cache_put(self._char_cache, cache_key, char_results)
+        return char_results
     
-    def run_business_validation(self) -> Dict[str, Any]:
+    def run_business_validation(self, files_fp: Optional[tuple] = None) -> Dict[str, Any]:
         """הרצת וולידציה עסקית"""
         self.kpi_calculator.log("Running business logic validation", "INFO")
         
+        cache_key = files_fp if files_fp is not None else self._files_fingerprint()
+        cached = self._cache_get(self._biz_cache, cache_key, 'business')
+        if cached is not None:
+            return dict(cached, business_logs=self.business_adapter.get_logs())
+        
         # הרצת וולידציה עסקית
         business_results = self.business_adapter.validate_business_logic(self.extracted_files_data)
         
@@ -245,14 +317,15 @@ class EnhancedValidationProcessor:
         
         # חישוב סטטיסטיקות כלליות
         total_files = len(business_results)
-        successful_validations = sum(1 for r in business_results.values() if r.get('success', False))
-        average_score = 0
-        
-        if successful_validations > 0:
-            scores = [r.get('score', 0) for r in business_results.values() if r.get('success', False)]
-            average_score = sum(scores) / len(scores)
-        
-        return {
+        successful_validations = 0
+        score_total = 0
+        for r in business_results.values():
+            if r.get('success', False):
+                successful_validations += 1
+                score_total += r.get('score', 0)
+        average_score = score_total / successful_validations if successful_validations else 0
+        
+        business_validation = {
             'type': 'business_logic',
             'business_results': business_results,
             'detailed_report': business_report,
@@ -264,6 +337,43 @@ class EnhancedValidationProcessor:
             },
             'business_logs': self.business_adapter.get_logs()
         }
+        self._cache_put(self._biz_cache, cache_key, business_validation)
+        return business_validation
+    
+    @staticmethod
+    def _fingerprint(obj: Any) -> Optional[bytes]:
+        """טביעת אצבע של תוכן (blake2b על ה-JSON המקודד); None אם התוכן לא ניתן לקידוד"""
+        try:
+            return hashlib.blake2b(dumps(obj, indent=False, default=str), digest_size=16).digest()
+        except (TypeError, ValueError):
+            return None
+    
+    def _files_fingerprint(self) -> Optional[tuple]:
+        """טביעות אצבע של כל הקבצים; None (ללא מטמון) אם אחד מהם לא ניתן לקידוד"""
+        fingerprints = []
+        for file_key, items in self.extracted_files_data.items():
+            fp = self._fingerprint(items)
+            if fp is None:
+                return None
+            fingerprints.append((file_key, fp))
+        return tuple(fingerprints)
+    
+    def _cache_get(self, cache: OrderedDict, key: Optional[tuple], kind: str) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        cached = cache.get(key)
+        if cached is not None:
+            cache.move_to_end(key)
+            self.kpi_calculator.log(f"Validation cache hit: {kind}", "INFO")
+        return cached
+    
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key: Optional[tuple], results: Dict[str, Any]):
+        if key is None:
+            return
+        cache[key] = results
+        if len(cache) > VALIDATION_CACHE_SIZE:
+            cache.popitem(last=False)
     
     def combine_validation_results(self, char_results: Dict[str, Any], business_results: Dict[str, Any]) -> Dict[str, Any]:
         """שילוב תוצאות משתי השיטות"""
@@ -272,53 +382,62 @@ class EnhancedValidationProcessor:
             'overall_summary': {}
         }
         
+        char_kpi = char_results.get('kpi_results', {})
+        biz = business_results.get('business_results', {})
+        files_analysis = combined['files_analysis']
+        pct = format_percent
+        char_weight = 0.6  # משקל גבוה יותר לדיוק תווים
+        business_weight = 0.4
+        
         # ניתוח לכל קובץ
-        for file_key in self.extracted_files_data.keys():
+        for file_key in self.extracted_files_data:
             file_analysis = {
                 'file_name': file_key
             }
             
             # נתוני וולידציה ברמת תווים
-            if file_key in char_results.get('kpi_results', {}):
-                char_data = char_results['kpi_results'][file_key]
-                file_analysis['character_accuracy'] = char_data['overall_accuracy']
-                file_analysis['character_score'] = f"{char_data['overall_accuracy']:.1%}"
+            char_data = char_kpi.get(file_key)
+            if char_data is not None:
+                char_accuracy = char_data['overall_accuracy']
+                file_analysis['character_accuracy'] = char_accuracy
+                file_analysis['character_score'] = pct(char_accuracy)
             
             # נתוני וולידציה עסקית
-            if file_key in business_results.get('business_results', {}):
-                business_data = business_results['business_results'][file_key]
+            business_data = biz.get(file_key)
+            if business_data is not None:
                 if business_data.get('success', False):
-                    file_analysis['business_score'] = business_data['score']
+                    business_score = business_data['score']
+                    file_analysis['business_score'] = business_score
                     file_analysis['business_status'] = business_data['status']
                     file_analysis['business_issues'] = len(business_data.get('issues', []))
                 else:
+                    business_score = 0
                     file_analysis['business_score'] = 0
                     file_analysis['business_status'] = 'FAILED'
                     file_analysis['business_error'] = business_data.get('error', 'Unknown error')
             
             # ציון משוקלל (אם יש נתונים משתי השיטות)
-            if 'character_accuracy' in file_analysis and 'business_score' in file_analysis:
-                char_weight = 0.6  # משקל גבוה יותר לדיוק תווים
-                business_weight = 0.4
+            if char_data is not None and business_data is not None:
                 combined_score = (
-                    file_analysis['character_accuracy'] * char_weight + 
-                    file_analysis['business_score'] / 100 * business_weight
+                    char_accuracy * char_weight + 
+                    business_score / 100 * business_weight
                 )
-                file_analysis['combined_score'] = f"{combined_score:.1%}"
+                file_analysis['combined_score'] = pct(combined_score)
+                file_analysis['combined_score_numeric'] = combined_score
             
-            combined['files_analysis'][file_key] = file_analysis
+            files_analysis[file_key] = file_analysis
         
         # סיכום כללי
         char_avg = sum(
             analysis.get('character_accuracy', 0) 
-            for analysis in combined['files_analysis'].values()
-        ) / len(combined['files_analysis'])
+            for analysis in files_analysis.values()
+        ) / len(files_analysis) if files_analysis else 0.0
         
         business_avg = business_results['statistics']['average_score'] / 100
         
         combined['overall_summary'] = {
-            'average_character_accuracy': f"{char_avg:.1%}",
-            'average_business_score': f"{business_avg:.1%}",
+            'average_character_accuracy': format_percent(char_avg),
+            'average_business_score': format_percent(business_avg),
             'files_analyzed': len(combined['files_analysis'])
         }
         
@@ -339,54 +458,65 @@ class EnhancedValidationProcessor:
             expanded_data['columns'].extend([f'{file_key}_result', f'{file_key}_score'])
         expanded_data['columns'].append('overall_score')
         
+        # מילוני דיוק השדות לכל קובץ - נשלפים פעם אחת
+        field_accuracies = [kpi_results[file_key].get('field_accuracies', {}) for file_key in file_keys]
+        n_files = len(file_keys)
+        
         # איסוף כל השדות הייחודיים
         all_fields = set()
-        for file_key in file_keys:
-            if 'field_accuracies' in kpi_results[file_key]:
-                all_fields.update(kpi_results[file_key]['field_accuracies'].keys())
+        for accuracies in field_accuracies:
+            all_fields.update(accuracies.keys())
         
         # איסוף נתוני מקור (Ground Truth) לפי שדה
         gt_by_field = self.organize_ground_truth_by_field()
         
+        pct = format_percent
+        
         # בניית שורות הנתונים
+        rows = expanded_data['rows']
         for field in sorted(all_fields):
-            row_data = {
-                'field': field,
-                'source_data': self.format_source_data(gt_by_field.get(field, [])),
-                'file_results': {},
-                'overall_score': 0
-            }
-            
-            field_scores = []
-            for file_key in file_keys:
-                if field in kpi_results[file_key].get('field_accuracies', {}):
-                    field_data = kpi_results[file_key]['field_accuracies'][field]
+            file_results = {}
+            total = 0
+            for file_key, accuracies in zip(file_keys, field_accuracies):
+                field_data = accuracies.get(field)
+                if field_data is not None:
                     accuracy = field_data['accuracy']
-                    
-                    row_data['file_results'][file_key] = {
+                    file_results[file_key] = {
                         'result': f"{field_data['correct_chars']}/{field_data['total_chars']}",
-                        'score': f"{accuracy:.1%}",
+                        'score': pct(accuracy),
                         'accuracy_numeric': accuracy
                     }
-                    field_scores.append(accuracy)
+                    total += accuracy
                 else:
-                    row_data['file_results'][file_key] = {
-                        'result': "-",
-                        'score': "-",
-                        'accuracy_numeric': 0
-                    }
-                    field_scores.append(0)
-            
-            # חישוב ציון כללי לשדה
-            if field_scores:
-                row_data['overall_score'] = sum(field_scores) / len(field_scores)
+                    # מילון חדש לכל תא חסר - הצרכנים רשאים לשנות תא בלי להשפיע על אחרים
+                    file_results[file_key] = {'result': "-", 'score': "-", 'accuracy_numeric': 0}
             
-            expanded_data['rows'].append(row_data)
+            rows.append({
+                'field': field,
+                'source_data': self.format_source_data(gt_by_field.get(field, [])),
+                'file_results': file_results,
+                # חישוב ציון כללי לשדה
+                'overall_score': total / n_files if n_files else 0
+            })
         
         return expanded_data
     
+    def _ensure_field_index(self):
+        """שדות ומספרי שורות מכל הקבצים הטעונים - מחושב פעם אחת לכל טעינה"""
+        if self._fields_cache is None:
+            all_fields = set()
+            for items in self.extracted_files_data.values():
+                for item in items:
+                    all_fields.update(item.keys())
+            line_numbers = set().union(*self._lines_per_file.values())
+            self._fields_cache = (all_fields, line_numbers)
+        return self._fields_cache
+    
     def organize_ground_truth_by_field(self) -> Dict[str, List[str]]:
-        """ארגון נתוני Ground Truth לפי שדה"""
+        """ארגון נתוני Ground Truth לפי שדה (נשמר עד לטעינת Ground Truth חדש)"""
+        if self._gt_by_field_cache is not None:
+            return self._gt_by_field_cache
+        
         gt_by_field = {}
         
         if not self.ground_truth_data:
@@ -395,10 +525,9 @@ class EnhancedValidationProcessor:
         for gt_item in self.ground_truth_data:
             for field, value in gt_item.items():
                 if field != 'line' and value is not None:
-                    if field not in gt_by_field:
-                        gt_by_field[field] = []
-                    gt_by_field[field].append(str(value))
+                    gt_by_field.setdefault(field, []).append(str(value))
         
+        self._gt_by_field_cache = gt_by_field
         return gt_by_field
     
     def format_source_data(self, values: List[str]) -> str:
@@ -421,29 +550,30 @@ class EnhancedValidationProcessor:
     
     def get_comparison_summary(self) -> Dict[str, Any]:
         """קבלת סיכום השוואה קצר - מותאם לשיטת הוולידציה"""
-        if not self.validation_results:
+        vr = self.validation_results
+        if not vr:
             return {}
         
         summary = {}
         
-        if self.validation_method == ValidationMethod.CHARACTER_LEVEL:
-            kpi_results = self.validation_results['kpi_results']
+        if self._is_char:
+            kpi_results = vr['kpi_results']
             for file_key, results in kpi_results.items():
                 summary[file_key] = {
                     'accuracy': results['overall_accuracy'],
-                    'accuracy_percent': f"{results['overall_accuracy']:.1%}",
+                    'accuracy_percent': format_percent(results['overall_accuracy']),
                     'type': 'character',
                     'rank': 0  # יחושב אחר כך
                 }
         
-        elif self.validation_method == ValidationMethod.BUSINESS_LOGIC:
-            business_results = self.validation_results['business_results']
+        elif self._is_business:
+            business_results = vr['business_results']
             for file_key, results in business_results.items():
                 if results.get('success', False):
                     score = results['score'] / 100
                     summary[file_key] = {
                         'accuracy': score,
-                        'accuracy_percent': f"{score:.1%}",
+                        'accuracy_percent': format_percent(score),
                         'status': results['status'],
                         'type': 'business',
                         'rank': 0
@@ -458,30 +588,31 @@ class EnhancedValidationProcessor:
                         'rank': 999  # דירוג נמוך לקבצים כושלים
                     }
         
-        elif self.validation_method == ValidationMethod.BOTH:
-            combined_analysis = self.validation_results['combined_analysis']['files_analysis']
+        elif self._is_both:
+            combined_analysis = vr['combined_analysis']['files_analysis']
             for file_key, analysis in combined_analysis.items():
                 if 'combined_score' in analysis:
-                    combined_score = float(analysis['combined_score'].rstrip('%')) / 100
+                    combined_score = analysis['combined_score_numeric']
                     summary[file_key] = {
                         'accuracy': combined_score,
                         'accuracy_percent': analysis['combined_score'],
-                        'character_score': f"{analysis.get('character_accuracy', 0):.1%}",
+                        'character_score': format_percent(analysis.get('character_accuracy', 0)),
                         'business_score': f"{analysis.get('business_score', 0)}",
                         'business_status': analysis.get('business_status', 'N/A'),
                         'type': 'combined',
                         'rank': 0
                     }
         
-        # דירוג לפי דיוק
-        sorted_files = sorted(summary.items(), key=lambda x: x[1]['accuracy'], reverse=True)
-        for i, (file_key, data) in enumerate(sorted_files):
-            summary[file_key]['rank'] = i + 1
+        # דירוג לפי דיוק - מיון tuples ללא פונקציית key; -i שומר על הסדר המקורי בשוויון
+        ranked = sorted(((data['accuracy'], -i, file_key)
+                         for i, (file_key, data) in enumerate(summary.items())), reverse=True)
+        for rank, (_, _, file_key) in enumerate(ranked, 1):
+            summary[file_key]['rank'] = rank
         
         return summary
     
-    def export_results(self, output_path: str) -> bool:
-        """יצוא תוצאות לקובץ"""
+    def export_results(self, output_path: str, pretty: bool = False) -> bool:
+        """יצוא תוצאות לקובץ (pretty=True לקובץ מוזח לקריאה אנושית)"""
         if not self.validation_results:
             return False
         
@@ -490,14 +621,13 @@ class EnhancedValidationProcessor:
             export_data = self.validation_results.copy()
             export_data['export_metadata'] = {
                 'exported_at': datetime.now().isoformat(),
-                'validation_method': self.validation_method.value,
+                'validation_method': self._method_value,
                 'files_exported': list(self.extracted_files_data.keys()),
                 'ground_truth_required': self.is_ground_truth_required(),
                 'ground_truth_count': len(self.ground_truth_data) if self.ground_truth_data else 0
             }
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
+            dump_path(export_data, output_path, indent=pretty, default=str)
             
             self.kpi_calculator.log(f"Results exported to: {output_path}", "INFO")
             return True
@@ -508,14 +638,14 @@ class EnhancedValidationProcessor:
     
     def get_field_comparison_details(self, file_key: str) -> Dict[str, Any]:
         """קבלת פירוט השוואה לכל שדה - רק לוולידציה ברמת תווים"""
-        if (self.validation_method == ValidationMethod.BUSINESS_LOGIC or
-            not self.validation_results or 
-            'kpi_results' not in self.validation_results):
+        vr = self.validation_results
+        if self._is_business or not vr or 'kpi_results' not in vr:
             return {}
         
-        kpi_results = self.validation_results.get('kpi_results', {})
-        if self.validation_method == ValidationMethod.BOTH:
-            kpi_results = self.validation_results['character_level'].get('kpi_results', {})
+        if self._is_both:
+            kpi_results = vr['character_level'].get('kpi_results', {})
+        else:
+            kpi_results = vr.get('kpi_results', {})
         
         if file_key not in kpi_results:
             return {}
@@ -526,7 +656,7 @@ class EnhancedValidationProcessor:
         for field_name, field_data in file_results['field_accuracies'].items():
             field_details[field_name] = {
                 'accuracy': field_data['accuracy'],
-                'accuracy_percent': f"{field_data['accuracy']:.1%}",
+                'accuracy_percent': format_percent(field_data['accuracy']),
                 'total_chars': field_data['total_chars'],
                 'correct_chars': field_data['correct_chars'],
                 'error_chars': field_data['total_chars'] - field_data['correct_chars']
@@ -540,6 +670,11 @@ class EnhancedValidationProcessor:
         self.extracted_files_data.clear()
         self.ground_truth_data = None
         self.validation_results = None
+        self._char_cache.clear()
+        self._biz_cache.clear()
+        self._lines_per_file.clear()
+        self._fields_cache = None
+        self._gt_by_field_cache = None
         self.kpi_calculator.clear_logs()
         self.business_adapter.clear_logs()
         self.kpi_calculator.log("All data cleared", "INFO")
@@ -5,6 +5,7 @@ main_validation_app.py - אפליקציית הווליזציה הראשית
 
 import sys
 import os
+import importlib.util
 from pathlib import Path
 
 # הוספת הנתיב הנוכחי ל-sys.path כדי לאפשר import של המודולים
@@ -28,13 +29,11 @@ except ImportError as e:
 def check_dependencies():
     """בדיקת תלויות נדרשות"""
     required_modules = ['tkinter', 'json', 'pathlib', 'threading', 'typing']
-    missing_modules = []
-    
-    for module in required_modules:
-        try:
-            __import__(module)
-        except ImportError:
-            missing_modules.append(module)
+    # המודולים כבר נטענו ע"י ה-imports למעלה; find_spec רק למה שעוד לא ב-sys.modules
+    missing_modules = [
+        module for module in required_modules
+        if module not in sys.modules and importlib.util.find_spec(module) is None
+    ]
     
     if missing_modules:
         print(f"מודולים חסרים: {', '.join(missing_modules)}")
@@ -1,11 +1,11 @@
 # validation/__init__.py
 from .schemas import Invoice, LineItem, InvoiceIntro, InvoiceFinal
 from .validator import BusinessValidator
-from .rules import run_all_rules
+from .rules import Issue, run_all_rules
 from .reporting import export_issues_json, export_issues_csv
 
 __all__ = [
     'Invoice', 'LineItem', 'InvoiceIntro', 'InvoiceFinal',
-    'BusinessValidator', 'run_all_rules', 
+    'BusinessValidator', 'Issue', 'run_all_rules', 
     'export_issues_json', 'export_issues_csv'
 ]
\ No newline at end of file
@@ -0,0 +1,111 @@
+# validation/json_io.py
+# קריאה וכתיבה של JSON דרך orjson כשהוא מותקן, עם נפילה ל-json הסטנדרטי.
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+from pathlib import Path
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# orjson מפענח מספר שלם מחוץ לטווח 64 ביט כ-float (איבוד דיוק בברקודים/קודים ארוכים).
+# רצף של 19+ ספרות בקלט (גם בתוך מחרוזת - אז זה רק איטי יותר) שולח את הפענוח ל-json הסטנדרטי.
+_LONG_DIGITS_BYTES = re.compile(rb"[0-9]{19,}")
+_LONG_DIGITS_STR = re.compile(r"[0-9]{19,}")
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        long_digits = _LONG_DIGITS_STR if isinstance(data, str) else _LONG_DIGITS_BYTES
+        if long_digits.search(data) is None:
+            return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any, indent: bool = True, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """מחזיר UTF-8 bytes; תווים שאינם ASCII (עברית) נשמרים כמו שהם."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # למשל int מעבר ל-64 ביט, ש-orjson לא מקודד גם עם default - json הסטנדרטי כן
+            pass
+    text = json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=default)
+    return text.encode("utf-8")
+
+def load_path(path: Union[str, Path]) -> Any:
+    return loads(Path(path).read_bytes())
+
+def dump_path(obj: Any, path: Union[str, Path], indent: bool = True,
+              default: Optional[Callable[[Any], Any]] = None) -> None:
+    Path(path).write_bytes(dumps(obj, indent=indent, default=default))
+
+def _starts_with_array(f) -> bool:
+    """האם ערך ה-JSON העליון בקובץ הוא מערך (לפי התו הראשון שאינו רווח)"""
+    while True:
+        chunk = f.read(256)
+        if not chunk:
+            return False
+        chunk = chunk.lstrip()
+        if chunk:
+            return chunk[:1] == b"["
+
+_MISSING = object()
+
+def _resolve(top: Dict[str, Any], path: List[str]) -> Any:
+    """הערך במסלול path (רשימת מפתחות) או _MISSING"""
+    node: Any = top
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return _MISSING
+        node = node[key]
+    return node
+
+def stream_items(path: Union[str, Path], prefixes: Sequence[str]) -> Optional[List[Any]]:
+    """קריאה זורמת (ijson) של המערך תחת הקידומת הראשונה (לפי סדר prefixes) שקיימת בקובץ,
+    במעבר יחיד על הקובץ. מערך ריק תחת הקידומת הזו מוחזר כמו שהוא ([]).
+    מחזיר None אם ijson לא מותקן, שאף קידומת לא נמצאה, שהערך שנמצא אינו מערך
+    או שהקריאה הזורמת נכשלה - ואז הקורא טוען את הקובץ במלואו."""
+    if ijson is None:
+        return None
+    with Path(path).open("rb") as f:
+        try:
+            if _starts_with_array(f):
+                if "item" not in prefixes:
+                    return None
+                f.seek(0)
+                return list(ijson.items(f, "item", use_float=True))
+            
+            # אובייקט עליון: מסלולי המפתחות (ללא ".item") לפי סדר העדיפות
+            key_paths = [p.split(".")[:-1] for p in prefixes if p != "item"]
+            if not key_paths:
+                return None
+            wanted = {key_path[0] for key_path in key_paths}
+            first = key_paths[0][0]
+            top: Dict[str, Any] = {}
+            f.seek(0)
+            # רק ערכי המפתחות העליונים הרלוונטיים נשמרים; המפתח בעדיפות העליונה מסיים את הסריקה
+            for key, value in ijson.kvitems(f, "", use_float=True):
+                if key in wanted:
+                    top[key] = value
+                    if key == first:
+                        break
+        except ijson.JSONError:
+            # use_float לא תומך בשלמים מעבר ל-64 ביט (וגם JSON פגום) - הקורא יטען את הקובץ במלואו
+            return None
+    
+    for key_path in key_paths:
+        found = _resolve(top, key_path)
+        if found is not _MISSING:
+            return found if isinstance(found, list) else None
+    return None
@@ -0,0 +1,31 @@
+# validation/json_paths.py
+# מזהה היכן נמצאת רשימת השורות (main_items) במבני ה-JSON השונים של המערכת.
+
+from __future__ import annotations
+from typing import Any, Dict, List
+
+ITEMS_NONE = -1
+ITEMS_MAIN = 0      # main.main_items
+ITEMS_DIRECT = 1    # main_items
+ITEMS_DATA = 2      # data (רשימה)
+
+def detect_items_path(json_data: Any) -> int:
+    """זיהוי מבנה הקובץ פעם אחת; התוצאה מועברת ל-get_items."""
+    if isinstance(json_data, dict):
+        main = json_data.get('main')
+        if isinstance(main, dict) and 'main_items' in main:
+            return ITEMS_MAIN
+        if 'main_items' in json_data:
+            return ITEMS_DIRECT
+        if isinstance(json_data.get('data'), list):
+            return ITEMS_DATA
+    return ITEMS_NONE
+
+def get_items(json_data: Any, items_path: int) -> List[Dict[str, Any]]:
+    if items_path == ITEMS_MAIN:
+        return json_data['main']['main_items']
+    if items_path == ITEMS_DIRECT:
+        return json_data['main_items']
+    if items_path == ITEMS_DATA:
+        return json_data['data']
+    return []
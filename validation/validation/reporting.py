@@ -2,23 +2,30 @@
 # מייצא את תוצאות הוולידציה העסקית כ-JSON או CSV לשימוש חיצוני/דוחות.
 
 from __future__ import annotations
-from typing import Dict, List
-import json, csv
+from typing import Dict, List, Union
+import csv
+from io import StringIO
 from pathlib import Path
 
-def export_issues_json(issues: List[Dict], path: Path):
+from .json_io import dump_path
+from .rules import Issue
+
+# issues מגיעים כמילונים (תוצאת BusinessValidator) או כ-Issue (run_all_rules / check_*)
+IssueLike = Union[Issue, Dict[str, str]]
+
+def export_issues_json(issues: List[IssueLike], path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(issues, f, ensure_ascii=False, indent=2)
+    dump_path([i._asdict() if isinstance(i, Issue) else i for i in issues], path)
 
-def export_issues_csv(issues: List[Dict], path: Path):
+def export_issues_csv(issues: List[IssueLike], path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
     if not issues:
-        path.write_text("", encoding="utf-8")
+        path.write_bytes(b"")
         return
-    keys = ["code", "severity", "path", "found", "expected", "message"]
-    with path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=keys)
-        w.writeheader()
-        for i in issues:
-            w.writerow({k: i.get(k, "") for k in keys})
+    keys = Issue._fields
+    # בניית ה-CSV בזיכרון (שורות כ-tuple במקום DictWriter) וקידוד UTF-8 אחד בכתיבה
+    buf = StringIO(newline="")
+    w = csv.writer(buf)
+    w.writerow(keys)
+    w.writerows(i if isinstance(i, Issue) else tuple(i.get(k, "") for k in keys) for i in issues)
+    path.write_bytes(buf.getvalue().encode("utf-8"))
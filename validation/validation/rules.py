@@ -3,108 +3,179 @@
 
 from __future__ import annotations
 from decimal import Decimal
-from typing import Dict, List
-from .schemas import Invoice
+import sys
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+from .schemas import Invoice, InvoiceFinal, LineItem, LINE_PLACES, PERCENT_PLACES
 
 TOLERANCE = Decimal("0.05")
 DEFAULT_VAT = Decimal("17")
+_ZERO = Decimal("0")
+_ONE = Decimal("1")
+_INV_HUNDRED = Decimal("0.01")
+# מכמת לאגורות - נבנה פעם אחת במקום לפרסר את '0.01' בכל issue
+_Q2 = _ONE.scaleb(-2)
 
-Issue = Dict[str, str]
+# רמות חומרה - מחרוזות internalized אחידות לכל ה-issues, כך שהשוואה ושליפה מהמשקלות זולות
+ERROR = sys.intern("ERROR")
+WARN = sys.intern("WARN")
+INFO = sys.intern("INFO")
+
+class Issue(NamedTuple):
+    """ממצא של כלל בודד; הופך למילון (_asdict) רק בגבול ה-API של BusinessValidator"""
+    code: str
+    severity: str
+    path: str
+    found: str
+    expected: str
+    message: str
+
+# סטיית סכום שורה מותרת, בסקאלת ההפרש שמחושב מראש ב-LineItem
+_LINE_TOLERANCE = int(TOLERANCE.scaleb(LINE_PLACES))
+# ספי מע״מ/הנחה באותה סקאלה של אחוזים
+_DEFAULT_VAT_SCALED = int(DEFAULT_VAT.scaleb(PERCENT_PLACES))
+_DISCOUNT_HIGH_SCALED = 90 * 10 ** PERCENT_PLACES
 
 def _approx_equal(a: Decimal, b: Decimal, tol: Decimal = TOLERANCE) -> bool:
     return (a - b).copy_abs() <= tol
 
-def check_line_totals(inv: Invoice) -> List[Issue]:
+@lru_cache(maxsize=256)
+def _discount_factor(pct: Decimal) -> Decimal:
+    """1 - pct/100; אחוזי הנחה חוזרים הרבה (0, 5, 10...) ולכן נשמרים במטמון"""
+    return _ONE - pct * _INV_HUNDRED
+
+def _line_is_clean(scaled: Optional[Tuple[int, int, int]]) -> bool:
+    """כל בדיקות השורה (סכום, מע״מ, הנחה) על העמודות השלמות בקריאה אחת"""
+    if scaled is None:
+        return False
+    disc, vat, delta = scaled
+    return (vat == _DEFAULT_VAT_SCALED
+            and 0 <= disc <= _DISCOUNT_HIGH_SCALED
+            and -_LINE_TOLERANCE <= delta <= _LINE_TOLERANCE)
+
+def _line_total_issue(i: int, line: LineItem) -> Optional[Issue]:
+    scaled = line._scaled
+    # מסלול מהיר ומדויק בשלמים; Decimal מחושב רק כשנמצאה אי-התאמה
+    if scaled is not None and -_LINE_TOLERANCE <= scaled[2] <= _LINE_TOLERANCE:
+        return None
+    expected = line.qty * line.unit_price
+    if line.discount_pct:
+        expected *= _discount_factor(line.discount_pct)
+    if _approx_equal(line.line_total, expected):
+        return None
+    return Issue(
+        code="E-LINE-TOTAL-MISMATCH",
+        severity=ERROR,
+        path=f"lines[{i}].line_total",
+        found=str(line.line_total),
+        expected=str(expected.quantize(_Q2)),
+        message="Line total does not match qty×price×(1-discount)."
+    )
+
+def _vat_issue(i: int, line: LineItem) -> Optional[Issue]:
+    scaled = line._scaled
+    if scaled is not None and scaled[1] == _DEFAULT_VAT_SCALED:
+        return None
+    if line.vat_pct < 0 or line.vat_pct > 100:
+        return Issue(
+            code="E-VAT-RATE",
+            severity=ERROR,
+            path=f"lines[{i}].vat_pct",
+            found=str(line.vat_pct),
+            expected="0–100",
+            message="VAT percent out of range."
+        )
+    if line.vat_pct != DEFAULT_VAT:
+        return Issue(
+            code="W-VAT-UNUSUAL",
+            severity=WARN,
+            path=f"lines[{i}].vat_pct",
+            found=str(line.vat_pct),
+            expected=str(DEFAULT_VAT),
+            message="VAT percent differs from default."
+        )
+    return None
+
+def _discount_issue(i: int, line: LineItem) -> Optional[Issue]:
+    scaled = line._scaled
+    if scaled is not None and 0 <= scaled[0] <= _DISCOUNT_HIGH_SCALED:
+        return None
+    if line.discount_pct < 0 or line.discount_pct > 100:
+        return Issue(
+            code="E-DISCOUNT-RANGE",
+            severity=ERROR,
+            path=f"lines[{i}].discount_pct",
+            found=str(line.discount_pct),
+            expected="0–100",
+            message="Discount percent out of range."
+        )
+    if line.discount_pct > 90:
+        return Issue(
+            code="W-DISCOUNT-HIGH",
+            severity=WARN,
+            path=f"lines[{i}].discount_pct",
+            found=str(line.discount_pct),
+            expected="≤ 90",
+            message="Unusually high discount."
+        )
+    return None
+
+def _final_issues(final: InvoiceFinal, sum_lines: Decimal) -> List[Issue]:
     issues: List[Issue] = []
-    for i, line in enumerate(inv.lines):
-        expected = (line.qty * line.unit_price * (Decimal("1") - line.discount_pct/Decimal("100")))
-        if not _approx_equal(line.line_total, expected):
-            issues.append({
-                "code": "E-LINE-TOTAL-MISMATCH",
-                "severity": "ERROR",
-                "path": f"lines[{i}].line_total",
-                "found": str(line.line_total),
-                "expected": str(expected.quantize(Decimal('0.01'))),
-                "message": "Line total does not match qty×price×(1-discount)."
-            })
+    if not _approx_equal(final.subtotal, sum_lines):
+        issues.append(Issue(
+            code="E-SUBTOTAL-MISMATCH",
+            severity=ERROR,
+            path="final.subtotal",
+            found=str(final.subtotal),
+            expected=str(sum_lines.quantize(_Q2)),
+            message="Subtotal differs from sum of line totals."
+        ))
+    total_expected = final.subtotal + final.vat_amount
+    if not _approx_equal(final.total, total_expected):
+        issues.append(Issue(
+            code="E-TOTAL-MISMATCH",
+            severity=ERROR,
+            path="final.total",
+            found=str(final.total),
+            expected=str(total_expected.quantize(_Q2)),
+            message="Total differs from subtotal + VAT amount."
+        ))
     return issues
 
+def _collect(inv: Invoice, check) -> List[Issue]:
+    return [issue for i, line in enumerate(inv.lines) if (issue := check(i, line)) is not None]
+
+def check_line_totals(inv: Invoice) -> List[Issue]:
+    return _collect(inv, _line_total_issue)
+
 def check_subtotals(inv: Invoice) -> List[Issue]:
     if not inv.final:
         return []
-    issues: List[Issue] = []
-    sum_lines = sum([l.line_total for l in inv.lines], Decimal("0"))
-    if not _approx_equal(inv.final.subtotal, sum_lines):
-        issues.append({
-            "code": "E-SUBTOTAL-MISMATCH",
-            "severity": "ERROR",
-            "path": "final.subtotal",
-            "found": str(inv.final.subtotal),
-            "expected": str(sum_lines.quantize(Decimal('0.01'))),
-            "message": "Subtotal differs from sum of line totals."
-        })
-    total_expected = inv.final.subtotal + inv.final.vat_amount
-    if not _approx_equal(inv.final.total, total_expected):
-        issues.append({
-            "code": "E-TOTAL-MISMATCH",
-            "severity": "ERROR",
-            "path": "final.total",
-            "found": str(inv.final.total),
-            "expected": str(total_expected.quantize(Decimal('0.01'))),
-            "message": "Total differs from subtotal + VAT amount."
-        })
-    return issues
+    return _final_issues(inv.final, sum((l.line_total for l in inv.lines), _ZERO))
 
 def check_vat_reasonableness(inv: Invoice) -> List[Issue]:
-    issues: List[Issue] = []
-    for i, line in enumerate(inv.lines):
-        if line.vat_pct < 0 or line.vat_pct > 100:
-            issues.append({
-                "code": "E-VAT-RATE",
-                "severity": "ERROR",
-                "path": f"lines[{i}].vat_pct",
-                "found": str(line.vat_pct),
-                "expected": "0–100",
-                "message": "VAT percent out of range."
-            })
-        elif line.vat_pct != DEFAULT_VAT:
-            issues.append({
-                "code": "W-VAT-UNUSUAL",
-                "severity": "WARN",
-                "path": f"lines[{i}].vat_pct",
-                "found": str(line.vat_pct),
-                "expected": str(DEFAULT_VAT),
-                "message": "VAT percent differs from default."
-            })
-    return issues
+    return _collect(inv, _vat_issue)
 
 def check_discounts(inv: Invoice) -> List[Issue]:
-    issues: List[Issue] = []
-    for i, line in enumerate(inv.lines):
-        if line.discount_pct < 0 or line.discount_pct > 100:
-            issues.append({
-                "code": "E-DISCOUNT-RANGE",
-                "severity": "ERROR",
-                "path": f"lines[{i}].discount_pct",
-                "found": str(line.discount_pct),
-                "expected": "0–100",
-                "message": "Discount percent out of range."
-            })
-        elif line.discount_pct > 90:
-            issues.append({
-                "code": "W-DISCOUNT-HIGH",
-                "severity": "WARN",
-                "path": f"lines[{i}].discount_pct",
-                "found": str(line.discount_pct),
-                "expected": "≤ 90",
-                "message": "Unusually high discount."
-            })
-    return issues
+    return _collect(inv, _discount_issue)
 
 def run_all_rules(inv: Invoice) -> List[Issue]:
-    issues: List[Issue] = []
-    issues += check_line_totals(inv)
-    issues += check_subtotals(inv)
-    issues += check_vat_reasonableness(inv)
-    issues += check_discounts(inv)
-    return issues
+    """מעבר יחיד על השורות; סדר ה-issues זהה להרצת ה-check_* בזה אחר זה"""
+    line_issues: List[Issue] = []
+    vat_issues: List[Issue] = []
+    discount_issues: List[Issue] = []
+    sum_lines = _ZERO
+    for i, line in enumerate(inv.lines):
+        sum_lines += line.line_total
+        if _line_is_clean(line._scaled):
+            continue
+        if (issue := _line_total_issue(i, line)) is not None:
+            line_issues.append(issue)
+        if (issue := _vat_issue(i, line)) is not None:
+            vat_issues.append(issue)
+        if (issue := _discount_issue(i, line)) is not None:
+            discount_issues.append(issue)
+    if inv.final:
+        line_issues += _final_issues(inv.final, sum_lines)
+    return line_issues + vat_issues + discount_issues
@@ -2,21 +2,59 @@
 # מגדיר סכמות קשיחות (Pydantic) לחשבונית ולשורותיה עם Decimal ותיקוני ערכים בסיסיים.
 
 from __future__ import annotations
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 from decimal import Decimal, InvalidOperation
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 from datetime import date
 import re
 
+_WS_RE = re.compile(r"\s+")
+_ZERO = Decimal("0")
+
 def _to_decimal(v) -> Decimal:
+    # ערכים שכבר מספריים לא עוברים דרך str/strip/replace
+    kind = type(v)
+    if kind is Decimal:
+        return v
+    if kind is int:
+        return Decimal(v)
     if v is None or v == "":
-        return Decimal("0")
-    s = str(v).strip().replace(",", ".")
+        return _ZERO
+    if kind is float:
+        return Decimal(repr(v))
+    s = (v if kind is str else str(v)).strip().replace(",", ".")
     try:
         return Decimal(s)
     except (InvalidOperation, ValueError):
         raise ValueError(f"Invalid decimal: {v}")
 
+def _clean_description(v) -> str:
+    """ניקוי תיאור שורה: רווחים בקצוות ורצפי רווח לבן לרווח בודד; תיאור ריק אינו תקין"""
+    v = str(v or "").strip()
+    # רווח לבן שאינו רווח בודד הוא תמיד תו לא-מודפס, כך שתיאור "נקי" לא עובר ב-regex
+    if not (v.isprintable() and "  " not in v):
+        v = _WS_RE.sub(" ", v)
+    if not v:
+        raise ValueError("Empty description")
+    return v
+
+# סקאלות השלמים לבדיקות השורה: כמות באלפיות, מחיר וסכום באגורות, אחוזים (הנחה/מע״מ) בנקודות בסיס
+QTY_PLACES = 3
+CENTS_PLACES = 2
+PERCENT_PLACES = 2
+# סקאלת המכפלה qty * price * (100% - discount)
+LINE_PLACES = QTY_PLACES + CENTS_PLACES + PERCENT_PLACES + 2
+_FULL_PERCENT = 100 * 10 ** PERCENT_PLACES
+_TOTAL_SCALE = 10 ** (LINE_PLACES - CENTS_PLACES)
+
+def _scaled_int(d: Decimal, places: int) -> Optional[int]:
+    """d * 10**places כשלם, או None אם הערך לא מיוצג במדויק בסקאלה הזו"""
+    if not d.is_finite():
+        return None
+    s = d.scaleb(places)
+    i = int(s)
+    return i if s == i else None
+
 class LineItem(BaseModel):
     line_no: int = Field(ge=1)
     barcode: Optional[str] = None
@@ -28,15 +66,26 @@ class LineItem(BaseModel):
     price_after_discount: Optional[Decimal] = None
     vat_pct: Decimal = Decimal("17")
     line_total: Decimal
+    # (הנחה, מע״מ, סכום פחות qty×price×(1-discount)) כשלמים בסקאלות למעלה - מחושב פעם אחת בבנייה;
+    # None אם אחד מהשדות לא מדויק בסקאלה שלו
+    _scaled: Optional[Tuple[int, int, int]] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        parts = (_scaled_int(self.qty, QTY_PLACES),
+                 _scaled_int(self.unit_price, CENTS_PLACES),
+                 _scaled_int(self.discount_pct, PERCENT_PLACES),
+                 _scaled_int(self.vat_pct, PERCENT_PLACES),
+                 _scaled_int(self.line_total, CENTS_PLACES))
+        if None in parts:
+            self._scaled = None
+            return
+        qty, price, disc, vat, total = parts
+        self._scaled = (disc, vat, total * _TOTAL_SCALE - qty * price * (_FULL_PERCENT - disc))
 
     @field_validator("description", mode="before")
     @classmethod
     def _clean_desc(cls, v: str):
-        v = str(v or "").strip()
-        v = re.sub(r"\s+", " ", v)
-        if not v:
-            raise ValueError("Empty description")
-        return v
+        return _clean_description(v)
 
     @field_validator("qty", "unit_price", "discount_pct", "price_after_discount", "vat_pct", "line_total", mode="before")
     @classmethod
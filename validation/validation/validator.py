@@ -2,24 +2,87 @@
 # מריץ את כללי הוולידציה העסקית על חשבונית, מחזיר issues, ציון וסטטוס.
 
 from __future__ import annotations
-from typing import Any, Dict, List
-from .schemas import Invoice
-from .rules import run_all_rules
+from typing import Any, Dict, List, Tuple
+from .schemas import Invoice, InvoiceFinal, InvoiceIntro, LineItem, _clean_description, _to_decimal
+from .rules import ERROR, INFO, WARN, Issue, run_all_rules
 
-SEVERITY_WEIGHTS = {"ERROR": 10, "WARN": 3, "INFO": 0}
+SEVERITY_WEIGHTS = {ERROR: 10, WARN: 3, INFO: 0}
+
+_LINE_DECIMAL_FIELDS = ("qty", "unit_price", "discount_pct", "price_after_discount", "vat_pct", "line_total")
+_LINE_REQUIRED_FIELDS = ("line_no", "description", "qty", "unit_price", "line_total")
+_FINAL_DECIMAL_FIELDS = ("subtotal", "vat_amount", "total")
+
+def _with_decimals(data: Dict[str, Any], fields, required=()) -> Dict[str, Any]:
+    """עותק של data עם המרת Decimal לשדות המספריים שקיימים בו; KeyError אם חסר שדה חובה"""
+    for name in required:
+        if name not in data:
+            raise KeyError(name)
+    out = dict(data)
+    for name in fields:
+        if name in out:
+            out[name] = _to_decimal(out[name])
+    return out
+
+def _fast_line(line: Dict[str, Any]) -> LineItem:
+    data = _with_decimals(line, _LINE_DECIMAL_FIELDS, _LINE_REQUIRED_FIELDS)
+    line_no = data["line_no"]
+    if type(line_no) is not int or line_no < 1:
+        raise ValueError(f"Invalid line_no: {line_no!r}")
+    data["description"] = _clean_description(data["description"])
+    # שדות שחסרים מקבלים את ברירות המחדל של המודל (model_construct)
+    return LineItem.model_construct(**data)
+
+def _fast_build(invoice_json: Dict[str, Any]) -> Invoice:
+    """בניית Invoice ממקור מהימן דרך model_construct: המרת Decimal, ניקוי תיאור ובדיקת שדות חובה
+    כמו בסכמה, בלי שאר הולידטורים של Pydantic. קלט שחורג מזה מעלה KeyError/ValueError/TypeError."""
+    intro = invoice_json.get("intro")
+    final = invoice_json.get("final")
+    return Invoice.model_construct(
+        intro=InvoiceIntro.model_construct(**intro) if intro else None,
+        lines=[_fast_line(line) for line in invoice_json["lines"]],
+        final=(InvoiceFinal.model_construct(**_with_decimals(final, _FINAL_DECIMAL_FIELDS, _FINAL_DECIMAL_FIELDS))
+               if final else None),
+    )
 
 class BusinessValidator:
     @staticmethod
-    def _score(issues: List[Dict[str, str]]) -> int:
-        penalty = sum(SEVERITY_WEIGHTS.get(i["severity"], 0) for i in issues)
-        score = max(0, 100 - penalty)
-        return score
+    def _score(issues: List[Issue]) -> Tuple[int, bool]:
+        """(ציון, האם יש ERROR) במעבר יחיד; עוצר כשהציון כבר 0 - אז הסטטוס FAIL בכל מקרה"""
+        weights = SEVERITY_WEIGHTS
+        penalty = 0
+        has_error = False
+        for issue in issues:
+            severity = issue.severity
+            if severity == ERROR:
+                has_error = True
+            penalty += weights.get(severity, 0)
+            if penalty >= 100:
+                break
+        return max(0, 100 - penalty), has_error
 
     @staticmethod
     def validate(invoice_json: Dict[str, Any]) -> Dict[str, Any]:
         inv = Invoice.model_validate(invoice_json)
+        return BusinessValidator.validate_model(inv)
+
+    @staticmethod
+    def validate_trusted(invoice_json: Dict[str, Any]) -> Dict[str, Any]:
+        """כמו validate, עבור JSON ממקור מהימן (למשל המחלץ של המערכת) - ללא אימות סכמה מלא.
+        נדרש: "lines" כרשימת מילונים, ובכל שורה line_no (int >= 1), description, qty, unit_price
+        ו-line_total בערכים שניתנים להמרה ל-Decimal; ב-"final" (אם קיים) subtotal, vat_amount ו-total.
+        שדות חסרים אחרים מקבלים ברירת מחדל. קלט שלא עומד בזה עובר ל-validate המלא (ושגיאת ולידציה רגילה);
+        שאר האילוצים של הסכמה (למשל טיפוסי שדות intro) לא נבדקים."""
+        try:
+            inv = _fast_build(invoice_json)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return BusinessValidator.validate(invoice_json)
+        return BusinessValidator.validate_model(inv)
+
+    @staticmethod
+    def validate_model(inv: Invoice) -> Dict[str, Any]:
+        """כמו validate, עבור Invoice שכבר נבנה ואומת - ללא model_dump/model_validate חוזר."""
         issues = run_all_rules(inv)
-        score = BusinessValidator._score(issues)
-        status = "PASS" if score >= 90 and not any(i["severity"] == "ERROR" for i in issues) else \
+        score, has_error = BusinessValidator._score(issues)
+        status = "PASS" if score >= 90 and not has_error else \
                  "REVIEW" if score >= 70 else "FAIL"
-        return {"issues": issues, "score": score, "status": status}
+        return {"issues": [i._asdict() for i in issues], "score": score, "status": status}